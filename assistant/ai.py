@@ -1,5 +1,7 @@
-import requests
 import json
+import logging
+
+import requests
 from google import genai
 
 from django.conf import settings
@@ -7,6 +9,8 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from django.http import JsonResponse
 
+from core import metrics, profiling
+from otp.services import post_to_sidecar
 from assistant.models import ConversationMessage
 from assistant.context import get_assistant_context_with_context
 from assistant.tools import (
@@ -17,107 +21,111 @@ from assistant.tools import (
     TOOLS,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def call_llama(message, previous_context=[]):
-    resp = requests.post(
-        "https://openrouter.ai/api/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {settings.OPEN_ROUTER_API_KEY}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": "meta-llama/llama-3.1-8b-instruct",
-            "messages": [
-                {
-                    "role": "system",
-                    "content": get_assistant_context_with_context(
-                        conversation_context="\n".join(previous_context)
-                    ),
-                },
-                {"role": "user", "content": message},
-            ],
-        },
-    )
-    return resp.json()
+    with metrics.LLM_CALL_SECONDS.time(provider="openrouter", tool="none", outcome="ok"), profiling.outbound():
+        resp = requests.post(
+            "https://openrouter.ai/api/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {settings.OPEN_ROUTER_API_KEY}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": "meta-llama/llama-3.1-8b-instruct",
+                "messages": [
+                    {
+                        "role": "system",
+                        "content": get_assistant_context_with_context(
+                            conversation_context="\n".join(previous_context)
+                        ),
+                    },
+                    {"role": "user", "content": message},
+                ],
+            },
+        )
+        return resp.json()
 
 
 def call_gemini(client, message, previous_context=[]):
     system_prompt = get_assistant_context_with_context(
         conversation_context="\n".join(previous_context)
     )
-    return client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            {
-                "role": "user",
-                "parts": [{"text": system_prompt}],
-            },
-            {
-                "role": "user",
-                "parts": [{"text": message}],
-            },
-        ],
-        config=genai.types.GenerateContentConfig(
-            temperature=0.4,
-            tools=[
-                genai.types.Tool(
-                    function_declarations=[
-                        genai.types.FunctionDeclaration(
-                            name="confirm_presence",
-                            description=tool_confirm_presence.__doc__,
-                            parameters=genai.types.Schema(
-                                type="object",
-                                properties={
-                                    "phone": genai.types.Schema(type="string"),
-                                    "day1": genai.types.Schema(type="boolean"),
-                                    "day2": genai.types.Schema(type="boolean"),
-                                },
-                                required=["phone", "day1", "day2"],
+    with metrics.LLM_CALL_SECONDS.time(provider="gemini", tool="none", outcome="ok"), profiling.outbound():
+        return client.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=[
+                {
+                    "role": "user",
+                    "parts": [{"text": system_prompt}],
+                },
+                {
+                    "role": "user",
+                    "parts": [{"text": message}],
+                },
+            ],
+            config=genai.types.GenerateContentConfig(
+                temperature=0.4,
+                tools=[
+                    genai.types.Tool(
+                        function_declarations=[
+                            genai.types.FunctionDeclaration(
+                                name="confirm_presence",
+                                description=tool_confirm_presence.__doc__,
+                                parameters=genai.types.Schema(
+                                    type="object",
+                                    properties={
+                                        "phone": genai.types.Schema(type="string"),
+                                        "day1": genai.types.Schema(type="boolean"),
+                                        "day2": genai.types.Schema(type="boolean"),
+                                    },
+                                    required=["phone", "day1", "day2"],
+                                ),
                             ),
-                        ),
-                        genai.types.FunctionDeclaration(
-                            name="get_gift_options",
-                            description=get_gift_options.__doc__,
-                            parameters=genai.types.Schema(
-                                type="object",
-                                properties={},
-                                required=[],
+                            genai.types.FunctionDeclaration(
+                                name="get_gift_options",
+                                description=get_gift_options.__doc__,
+                                parameters=genai.types.Schema(
+                                    type="object",
+                                    properties={},
+                                    required=[],
+                                ),
                             ),
-                        ),
-                        genai.types.FunctionDeclaration(
-                            name="start_gift_payment",
-                            description=tool_start_gift_payment.__doc__,
-                            parameters=genai.types.Schema(
-                                type="object",
-                                properties={
-                                    "presente_id": genai.types.Schema(type="integer"),
-                                    "message": genai.types.Schema(type="string"),
-                                    "guest_phone": genai.types.Schema(type="string"),
-                                },
-                                required=["presente_id"],
+                            genai.types.FunctionDeclaration(
+                                name="start_gift_payment",
+                                description=tool_start_gift_payment.__doc__,
+                                parameters=genai.types.Schema(
+                                    type="object",
+                                    properties={
+                                        "presente_id": genai.types.Schema(type="integer"),
+                                        "message": genai.types.Schema(type="string"),
+                                        "guest_phone": genai.types.Schema(type="string"),
+                                    },
+                                    required=["presente_id"],
+                                ),
                             ),
-                        ),
-                        genai.types.FunctionDeclaration(
-                            name="start_custom_gift_payment",
-                            description=tool_start_custom_gift_payment.__doc__,
-                            parameters=genai.types.Schema(
-                                type="object",
-                                properties={
-                                    "valor": genai.types.Schema(type="number"),
-                                    "message": genai.types.Schema(type="string"),
-                                    "guest_phone": genai.types.Schema(type="string"),
-                                },
-                                required=["valor"],
+                            genai.types.FunctionDeclaration(
+                                name="start_custom_gift_payment",
+                                description=tool_start_custom_gift_payment.__doc__,
+                                parameters=genai.types.Schema(
+                                    type="object",
+                                    properties={
+                                        "valor": genai.types.Schema(type="number"),
+                                        "message": genai.types.Schema(type="string"),
+                                        "guest_phone": genai.types.Schema(type="string"),
+                                    },
+                                    required=["valor"],
+                                ),
                             ),
-                        ),
-                    ]
-                )
-            ],
-            tool_config=genai.types.ToolConfig(
-                function_calling_config=genai.types.FunctionCallingConfig(mode="AUTO")
+                        ]
+                    )
+                ],
+                tool_config=genai.types.ToolConfig(
+                    function_calling_config=genai.types.FunctionCallingConfig(mode="AUTO")
+                ),
             ),
-        ),
-    )
+        )
 
 
 #############################################
@@ -163,33 +171,28 @@ def generate_final_response(client, tool_name, tool_result):
     # -------------------------------
     # SEGUNDA CHAMADA — formato mínimo
     # -------------------------------
-    final = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[
-            {
-                "role": "model",
-                "parts": [{"text": instruction}],
-            },
-            {
-                "role": "user",
-                "parts": [{"text": json.dumps(tool_result, ensure_ascii=False)}],
-            },
-        ],
-    )
+    with metrics.LLM_CALL_SECONDS.time(provider="gemini", tool=tool_name, outcome="ok"), profiling.outbound():
+        final = client.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=[
+                {
+                    "role": "model",
+                    "parts": [{"text": instruction}],
+                },
+                {
+                    "role": "user",
+                    "parts": [{"text": json.dumps(tool_result, ensure_ascii=False)}],
+                },
+            ],
+        )
 
     return final.candidates[0].content.parts[0].text
 
 
 def send_whatsapp_message_to_jid(jid, message):
-    url = settings.WHATSAPP_SERVER_URL
     payload = {"jid": jid, "message": message}
-    try:
-        r = requests.post(url + "/send_jid_message", json=payload, timeout=15)
-        r.raise_for_status()
-        return True
-    except requests.exceptions.RequestException as exc:
-        print(f"Failed sending message to JID {jid}: {exc}")
-        return False
+    success, _ = post_to_sidecar("/send_jid_message", "WhatsApp JID message service", json=payload, timeout=15)
+    return success
 
 
 @csrf_exempt
@@ -206,9 +209,7 @@ def whatsapp_gemini_api(request):
         client = genai.Client(api_key=settings.GEMINI_API_KEY)
 
         # Retrieve past messages from JID.
-        context = ConversationMessage.objects.filter(jid=jid).first()
-        if not context:
-            context = ConversationMessage.objects.create(jid=jid, messages=[])
+        context, _ = ConversationMessage.objects.get_or_create(jid=jid, defaults={'messages': []})
         messages_list = [m for m in (context.messages or []) if isinstance(m, str)]
         if len(messages_list) > 10:
             messages_list = messages_list[-10:]
@@ -232,12 +233,14 @@ def whatsapp_gemini_api(request):
             tool_args = dict(tool_call.args)
 
             if tool_name in TOOLS:
-                tool_result = TOOLS[tool_name](**tool_args)
-                print("DEBUG: Tool result for", tool_name, ":", tool_result)
+                with metrics.ASSISTANT_TOOL_SECONDS.time(tool=tool_name, outcome="ok") as labels:
+                    tool_result = TOOLS[tool_name](**tool_args)
+                    if isinstance(tool_result, dict) and tool_result.get("success") is False:
+                        labels["outcome"] = "failed"
+                logger.debug("Resultado da tool %s para %s: %s", tool_name, jid, tool_result)
 
                 # Segunda chamada para gerar resposta final natural
                 final = generate_final_response(client, tool_name, tool_result)
-                print("DEBUG: Tool result for", tool_name, ":", tool_result)
                 # ai_message = final.candidates[0].content.parts[0].text
                 ai_message = final
 
@@ -255,13 +258,11 @@ def whatsapp_gemini_api(request):
         context.save()
 
         try:
-            print("Sending WhatsApp message to", jid)
-            print("Message content:", ai_message)
             send_whatsapp_message_to_jid(jid, ai_message)
-        except Exception as exc:
-            print(f"Failed to send WhatsApp message to {jid}: {exc}")
+        except Exception:
+            logger.exception("Falha ao enviar a resposta do assistente para %s", jid)
 
         return JsonResponse({"reply": ai_message})
     except Exception as e:
-        print("DEBUG: Exception in whatsapp_gemini_api", str(e))
+        logger.exception("Erro em whatsapp_gemini_api")
         return JsonResponse({"error": str(e)}, status=500)
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.27 on 2026-10-19 14:07
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def drop_duplicate_conversations(apps, schema_editor):
+    # Antes da restrição podia haver mais de uma linha por JID. O assistente
+    # lia e gravava sempre a primeira (.first(), menor id): é ela que fica.
+    ConversationMessage = apps.get_model('assistant', 'ConversationMessage')
+    db_alias = schema_editor.connection.alias
+    conversations = ConversationMessage.objects.using(db_alias)
+    keep = conversations.values('jid').annotate(first=Min('id')).values_list('first', flat=True)
+    conversations.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0002_conversationmessage_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_conversations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='conversationmessage',
+            name='jid',
+            field=models.CharField(help_text='WhatsApp JID, e.g. 115831006589136@lid or 5511999999999@s.whatsapp.net', max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='conversationmessage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -1,8 +1,11 @@
 # assistant/tools.py
+import logging
 
-from core.models import Guest, ExtraGuest, Presente, Pagamento
-from core.mercadopago_sdk import get_sdk
-from django.conf import settings
+from core import people
+from core.models import Guest, ExtraGuest, Presente
+from core.payments import start_checkout
+
+logger = logging.getLogger(__name__)
 
 
 # ==========================================================
@@ -50,15 +53,10 @@ def tool_confirm_presence(phone: str, day1: bool = True, day2: bool = True):
       }
     """
 
-    # 1. Convidado principal
-    guest = Guest.objects.filter(phone_number=phone).first()
-
-    # 2. Convidado extra (redireciona para o convidado principal)
+    # Convidado principal ou extra (numa consulta); a confirmação vale para o grupo todo
+    person = people.find_by_phone([phone])
+    guest = Guest.objects.filter(id=person['group_id']).first() if person else None
     if not guest:
-        extra = ExtraGuest.objects.filter(phone_number=phone).first()
-        if extra:
-            return tool_confirm_presence(extra.main_guest.phone_number, day1=day1, day2=day2)
-
         return {
             "success": False,
             "message": "Não encontrei seu número na lista de convidados.",
@@ -70,14 +68,13 @@ def tool_confirm_presence(phone: str, day1: bool = True, day2: bool = True):
         setattr(person, 'day2_status', 'confirmed' if day2 else 'rejected')
 
     # Update guest per-day fields
-    print(f"Updating guest {guest.name} statuses: day1={day1}, day2={day2}")
+    logger.info("Atualizando presença de %s (guest %s): day1=%s, day2=%s", guest.name, guest.id, day1, day2)
     _set_status(guest)
     guest.save()
 
     # Atualizar convidados extras do mesmo grupo
     extras = ExtraGuest.objects.filter(main_guest=guest)
     for eg in extras:
-        print(f"Updating extra guest {eg.name} statuses: day1={day1}, day2={day2}")
         _set_status(eg)
         eg.save()
 
@@ -191,46 +188,12 @@ def tool_start_gift_payment(presente_id: int, message: str = None, guest_phone:
         }
 
     try:
-        pagamento = Pagamento.objects.create(
-            presente=presente,
-            valor=presente.valor,
-        )
-
         # If guest_phone provided, try to associate with a Guest
-        if guest_phone:
-            guest = Guest.objects.filter(phone_number=guest_phone).first()
-            if guest:
-                pagamento.guest = guest
-                pagamento.nome_pagador = guest.name
-
-        # Save optional message
-        if message:
-            pagamento.message = message
-
-        pagamento.save()
-
-        preference_data = {
-            "items": [
-                {
-                    "title": presente.nome,
-                    "quantity": 1,
-                    "currency_id": "BRL",
-                    "unit_price": float(presente.valor),
-                }
-            ],
-            "external_reference": str(pagamento.id),
-            "back_urls": {
-                "success": f"{settings.SITE_URL}/pagamento/sucesso/",
-                "failure": f"{settings.SITE_URL}/pagamento/erro/",
-                "pending": f"{settings.SITE_URL}/pagamento/pendente/",
-            },
-            "notification_url": f"{settings.SITE_URL}/webhook/mercadopago/",
-        }
+        guest = Guest.objects.filter(phone_number=guest_phone).first() if guest_phone else None
 
-        sdk = get_sdk()
-        preference = sdk.preference().create(preference_data)
-
-        init_point = preference["response"].get("init_point")
+        _, init_point, _ = start_checkout(
+            presente.nome, presente.valor, presente=presente, guest=guest, message=message,
+        )
 
         return {
             "success": True,
@@ -284,46 +247,10 @@ def tool_start_custom_gift_payment(valor: float, message: str = None, guest_phon
         nome = f"Contribuição - R$ {valor:.2f}"
         # presente = Presente.objects.create(nome=nome, descricao="Contribuição personalizada", valor=valor)
 
-        pagamento = Pagamento.objects.create(
-            presente=None,
-            valor=valor,
-        )
-
         # Associate guest if phone provided
-        if guest_phone:
-            guest = Guest.objects.filter(phone_number=guest_phone).first()
-            if guest:
-                pagamento.guest = guest
-                pagamento.nome_pagador = guest.name
-
-        # Save optional message
-        if message:
-            pagamento.message = message
-
-        pagamento.save()
-
-        preference_data = {
-            "items": [
-                {
-                    "title": nome,
-                    "quantity": 1,
-                    "currency_id": "BRL",
-                    "unit_price": float(valor),
-                }
-            ],
-            "external_reference": str(pagamento.id),
-            "back_urls": {
-                "success": f"{settings.SITE_URL}/pagamento/sucesso/",
-                "failure": f"{settings.SITE_URL}/pagamento/erro/",
-                "pending": f"{settings.SITE_URL}/pagamento/pendente/",
-            },
-            "notification_url": f"{settings.SITE_URL}/webhook/mercadopago/",
-        }
-
-        sdk = get_sdk()
-        preference = sdk.preference().create(preference_data)
+        guest = Guest.objects.filter(phone_number=guest_phone).first() if guest_phone else None
 
-        init_point = preference["response"].get("init_point")
+        _, init_point, _ = start_checkout(nome, valor, guest=guest, message=message)
 
         return {
             "success": True,
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Presente, Pagamento
+from .models import AdminNotification, MercadoPagoNotification, Presente, Pagamento
 
 
 @admin.register(Presente)
@@ -24,3 +24,18 @@ class PagamentoAdmin(admin.ModelAdmin):
 
     def has_add_permission(self, request):
         return False  # Pagamentos não devem ser adicionados manualmente
+
+
+@admin.register(MercadoPagoNotification)
+class MercadoPagoNotificationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'topic', 'resource_id', 'status', 'attempts', 'received_at', 'processed_at']
+    search_fields = ['resource_id']
+    list_filter = ['status', 'topic']
+    readonly_fields = ['received_at', 'processed_at', 'locked_at']
+
+
+@admin.register(AdminNotification)
+class AdminNotificationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'recipient', 'pagamento', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status']
+    readonly_fields = ['created_at', 'locked_at', 'sent_at']
@@ -0,0 +1,37 @@
+"""
+SQLite ajustado para rodar tudo numa máquina só (SQLITE_TUNING).
+
+- PRAGMAs em cada conexão nova: WAL (leituras não esperam a escrita),
+  synchronous=NORMAL (seguro com WAL, sem fsync a cada commit), busy_timeout,
+  mmap e cache maiores. OPTIONS['pragmas'] no settings sobrescreve PRAGMAS.
+- Transações começam com BEGIN IMMEDIATE: o lock de escrita é pego no início
+  e, se estiver ocupado, a transação espera o busy_timeout. Com o BEGIN
+  padrão (DEFERRED) uma transação que leu e depois tenta escrever falha na
+  hora com "database is locked" se outra escreveu no meio.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms
+    'mmap_size': 128 * 1024 * 1024,
+    'cache_size': -20000,  # negativo = KiB
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
@@ -0,0 +1,519 @@
+"""
+Benchmark ponta a ponta com dublês locais do WhatsApp, Gemini e Mercado Pago.
+
+Nada sai da máquina: o serviço de WhatsApp vira um servidor HTTP local
+(`FakeSidecar`), o cliente do Gemini e o SDK do Mercado Pago são trocados por
+`FakeGemini` e `FakeMercadoPago`. Cada dublê tem latência e taxa de erro
+configuráveis (`Fault`).
+
+Os cenários passam pelas views de verdade (test Client do Django) e medem
+cada operação:
+
+- mass_send: envio em massa pelo painel (uma operação = uma mensagem);
+- assistant_burst: rajada de mensagens para /api/whatsapp/gemini;
+- webhook_storm: rajada de webhooks (com entregas repetidas) e depois o
+  processamento da fila;
+- otp_flood: rajada de logins por telefone.
+
+Roda com `python manage.py benchmark`, que cria um banco de teste só para
+isso; ver core/management/commands/benchmark.py.
+"""
+import itertools
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import Guest, MercadoPagoNotification, Pagamento, Presente, WhatsAppBatch
+
+logger = logging.getLogger(__name__)
+
+ADMIN_PHONE = '+5511900000000'
+
+
+class Fault:
+    """Latência (ms, com variação uniforme de ±jitter) e taxa de erro de um dublê."""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+
+    def wait(self):
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def fails(self):
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+    def __str__(self):
+        return f"{self.latency_ms}±{self.jitter_ms}ms, {self.error_rate:.0%} erros"
+
+
+# ----------------------------------------------------------------------
+# Dublês
+# ----------------------------------------------------------------------
+
+class FakeSidecar:
+    """Servidor local com /send_message, /send_otp e /send_jid_message."""
+
+    ENDPOINTS = ('/send_message', '/send_otp', '/send_jid_message')
+
+    def __init__(self, fault=None):
+        self.fault = fault or Fault()
+        self.calls = {endpoint: 0 for endpoint in self.ENDPOINTS}
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        sidecar = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, como o sidecar em Go
+            disable_nagle_algorithm = True  # senão cabeçalho e corpo separados custam ~40ms
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if self.path not in sidecar.ENDPOINTS:
+                    return self._reply(404, {'error': 'not found'})
+                with sidecar._lock:
+                    sidecar.calls[self.path] += 1
+                sidecar.fault.wait()
+                if sidecar.fault.fails():
+                    return self._reply(500, {'error': 'falha injetada'})
+                self._reply(200, {'success': True})
+
+            def _reply(self, status, data):
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='fake-sidecar', daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class FakeGemini:
+    """
+    Substitui o `genai.Client`. Com "confirmo" + telefone na mensagem pede a
+    tool confirm_presence, com "presentes" pede get_gift_options; o resto (e a
+    segunda chamada, sem config) vira resposta em texto.
+    """
+
+    PHONE_RE = re.compile(r'\+\d{10,15}')
+
+    def __init__(self, fault=None):
+        self.fault = fault or Fault()
+        self.models = self
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        return self  # genai.Client(api_key=...)
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        self.fault.wait()
+        if self.fault.fails():
+            raise RuntimeError("503 UNAVAILABLE (falha injetada)")
+
+        text = contents[-1]['parts'][0]['text']
+        part = SimpleNamespace(text="Resposta do assistente.", function_call=None)
+        if config is not None:
+            phone = self.PHONE_RE.search(text)
+            if 'confirmo' in text.lower() and phone:
+                part = SimpleNamespace(text=None, function_call=SimpleNamespace(
+                    name='confirm_presence', args={'phone': phone.group(0), 'day1': True, 'day2': True},
+                ))
+            elif 'presentes' in text.lower():
+                part = SimpleNamespace(text=None, function_call=SimpleNamespace(name='get_gift_options', args={}))
+        return SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))])
+
+
+class FakeMercadoPago:
+    """
+    Substitui o SDK: preference().create, payment().get e payment().search.
+    `payments` liga o ID do pagamento no Mercado Pago ao Pagamento (external_reference).
+    """
+
+    def __init__(self, fault=None):
+        self.fault = fault or Fault()
+        self.payments = {}
+        self.calls = 0
+        self._ids = itertools.count(1)
+
+    def preference(self):
+        return self
+
+    def payment(self):
+        return self
+
+    def _call(self):
+        self.calls += 1
+        self.fault.wait()
+        return self.fault.fails()
+
+    def create(self, data):
+        if self._call():
+            return {'status': 500, 'response': {'message': 'falha injetada'}}
+        preference_id = f"bench-{next(self._ids)}"
+        return {'status': 201, 'response': {
+            'id': preference_id,
+            'init_point': f"https://mercadopago.invalid/checkout?pref_id={preference_id}",
+        }}
+
+    def _payment(self, payment_id, reference):
+        return {
+            'id': payment_id, 'status': 'approved', 'external_reference': reference,
+            'payer': {'email': 'bench@example.com', 'first_name': 'Bench', 'last_name': None},
+        }
+
+    def get(self, payment_id):
+        if self._call():
+            return {'status': 500, 'response': {'message': 'falha injetada'}}
+        reference = self.payments.get(str(payment_id))
+        if reference is None:
+            return {'status': 404, 'response': {'message': 'Payment not found'}}
+        return {'status': 200, 'response': self._payment(payment_id, reference)}
+
+    def search(self, filters=None):
+        if self._call():
+            return {'status': 500, 'response': {'message': 'falha injetada'}}
+        # Sem filtro de data: todos os pagamentos, paginados
+        filters = filters or {}
+        offset, limit = filters.get('offset', 0), filters.get('limit', 30)
+        results = [self._payment(pid, ref) for pid, ref in self.payments.items()]
+        return {'status': 200, 'response': {
+            'results': results[offset:offset + limit], 'paging': {'total': len(results)},
+        }}
+
+
+# ----------------------------------------------------------------------
+# Medição
+# ----------------------------------------------------------------------
+
+@dataclass
+class Result:
+    name: str
+    wall: float = 0.0
+    errors: int = 0
+    timings: list = field(default_factory=list)
+
+    @property
+    def ops(self):
+        return len(self.timings)
+
+    @property
+    def throughput(self):
+        return self.ops / self.wall if self.wall else 0.0
+
+    def percentile(self, p):
+        """Percentil (nearest-rank) em ms."""
+        if not self.timings:
+            return 0.0
+        ordered = sorted(self.timings)
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * 1000
+
+    def as_dict(self):
+        return {
+            'scenario': self.name,
+            'ops': self.ops,
+            'errors': self.errors,
+            'wall_s': round(self.wall, 3),
+            'ops_per_s': round(self.throughput, 1),
+            'p50_ms': round(self.percentile(50), 1),
+            'p95_ms': round(self.percentile(95), 1),
+            'p99_ms': round(self.percentile(99), 1),
+        }
+
+
+def run_load(name, operation, total, concurrency):
+    """
+    Executa operation(i) para i em range(total) com `concurrency` threads.
+    A operação falha se levantar ou retornar False.
+    """
+    result = Result(name)
+    lock = threading.Lock()
+    counter = itertools.count()
+
+    def run_one(i):
+        started = time.perf_counter()
+        try:
+            ok = operation(i) is not False
+        except Exception:
+            logger.exception("Erro no cenário %s", name)
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            result.timings.append(elapsed)
+            result.errors += not ok
+
+    def worker():
+        try:
+            while True:
+                i = next(counter)
+                if i >= total:
+                    break
+                run_one(i)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        # Na thread atual (e na conexão atual), o que também serve aos testes
+        for i in range(total):
+            run_one(i)
+    else:
+        threads = [threading.Thread(target=worker, name=f"bench-{name}-{n}") for n in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    result.wall = time.perf_counter() - started
+    return result
+
+
+# ----------------------------------------------------------------------
+# Ambiente e dados
+# ----------------------------------------------------------------------
+
+class StandIns:
+    def __init__(self, sidecar_fault=None, gemini_fault=None, mercadopago_fault=None):
+        self.sidecar = FakeSidecar(sidecar_fault)
+        self.gemini = FakeGemini(gemini_fault)
+        self.mercadopago = FakeMercadoPago(mercadopago_fault)
+
+    @contextmanager
+    def active(self):
+        """Liga os dublês no lugar dos serviços reais enquanto o bloco roda."""
+        self.sidecar.start()
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(override_settings(
+                    WHATSAPP_SERVER_URL=self.sidecar.url,
+                    MERCADO_PAGO_ACCESS_TOKEN='bench-token',
+                    GEMINI_API_KEY='bench-key',
+                    WEDDING_ADMINS_WHATSAPP='',
+                    OTP_ENABLED=True,
+                ))
+                stack.enter_context(mock.patch('assistant.ai.genai.Client', self.gemini))
+                stack.enter_context(mock.patch('core.payments.get_sdk', lambda: self.mercadopago))
+                stack.enter_context(mock.patch('core.webhooks.get_sdk', lambda: self.mercadopago))
+                stack.enter_context(mock.patch('core.decorators.ADMIN_PHONES', [ADMIN_PHONE]))
+                yield self
+        finally:
+            self.sidecar.stop()
+
+
+def seed(guests):
+    """Convidados, presentes e o admin usados pelos cenários."""
+    Guest.objects.get_or_create(phone_number=ADMIN_PHONE, defaults={'name': 'Admin Bench'})
+    Guest.objects.bulk_create([
+        Guest(name=f"Convidado {n}", phone_number=f"+55118{n:08d}")
+        for n in range(guests)
+    ])
+    Presente.objects.bulk_create([
+        Presente(nome=f"Presente {n}", valor=Decimal(100 + n * 10))
+        for n in range(10)
+    ])
+
+
+def _guest_phones():
+    return list(Guest.objects.exclude(phone_number=ADMIN_PHONE).order_by('id').values_list('phone_number', flat=True))
+
+
+def admin_client():
+    client = Client()
+    admin = Guest.objects.get(phone_number=ADMIN_PHONE)
+    session = client.session
+    session['otp_user_id'] = admin.id
+    session['guest_authenticated'] = True
+    session.save()
+    # Sessão ativa do admin, como depois do verify_otp
+    admin.active_session_key = session.session_key
+    admin.active_until = timezone.now() + timedelta(hours=1)
+    admin.save(update_fields=['active_session_key', 'active_until'])
+    return client
+
+
+# ----------------------------------------------------------------------
+# Cenários
+# ----------------------------------------------------------------------
+
+def mass_send(stand_ins, requests, concurrency, timeout=300):
+    """Envio em massa pelo painel; cada operação é um send_whatsapp_message."""
+    from core import views
+
+    result = Result('mass_send')
+    send = views.send_whatsapp_message
+
+    def timed_send(*args, **kwargs):
+        started = time.perf_counter()
+        success, error = send(*args, **kwargs)
+        result.timings.append(time.perf_counter() - started)
+        result.errors += not success
+        return success, error
+
+    selected = [f"guest-{pk}" for pk in Guest.objects.exclude(phone_number=ADMIN_PHONE).order_by('id').values_list('id', flat=True)[:requests]]
+    with mock.patch('core.views.send_whatsapp_message', timed_send), \
+            mock.patch('core.views.WHATSAPP_SEND_DELAY_SECONDS', 0):
+        started = time.perf_counter()
+        response = admin_client().post(reverse('send_whatsapp_mass'), {
+            'message': 'Olá {{name}}, teste de carga.', 'selected_guests': selected, 'status': 'all',
+        })
+        if response.status_code != 302:
+            raise RuntimeError(f"send_whatsapp_mass respondeu {response.status_code}")
+        batch = WhatsAppBatch.objects.order_by('-id').first()
+        deadline = time.monotonic() + timeout
+        while batch.status != 'completed' and time.monotonic() < deadline:
+            time.sleep(0.05)
+            batch.refresh_from_db(fields=['status'])
+        result.wall = time.perf_counter() - started
+    return [result]
+
+
+def assistant_burst(stand_ins, requests, concurrency):
+    """Rajada de mensagens para o assistente: 1/3 confirma presença, 1/3 pede presentes, 1/3 texto."""
+    phones = _guest_phones()
+
+    def send(i):
+        phone = phones[i % len(phones)]
+        text = [
+            f"Confirmo presença nos dois dias, meu número é {phone}",
+            "Quais presentes posso dar?",
+            "Que horas começa a cerimônia?",
+        ][i % 3]
+        response = Client().post(
+            reverse('whatsapp_gemini_api'),
+            json.dumps({'jid': f"{phone.lstrip('+')}@s.whatsapp.net", 'message': text}),
+            content_type='application/json',
+        )
+        return response.status_code == 200
+
+    return [run_load('assistant_burst', send, requests, concurrency)]
+
+
+def webhook_storm(stand_ins, requests, concurrency):
+    """
+    Rajada de webhooks do Mercado Pago (cada pagamento notificado ~3 vezes,
+    metade por query string e metade em JSON) e depois o esvaziamento da fila.
+    """
+    from core import webhooks
+
+    presentes = list(Presente.objects.all()[:10])
+    pagamentos = Pagamento.objects.bulk_create([
+        Pagamento(presente=presentes[n % len(presentes)], valor=presentes[n % len(presentes)].valor)
+        for n in range(max(1, requests // 3))
+    ])
+    payment_ids = []
+    for n, pagamento in enumerate(pagamentos):
+        payment_id = str(90000000 + n)
+        stand_ins.mercadopago.payments[payment_id] = str(pagamento.id)
+        payment_ids.append(payment_id)
+
+    def deliver(i):
+        payment_id = payment_ids[i % len(payment_ids)]
+        url = reverse('webhook_mercadopago')
+        if i % 2:
+            response = Client().post(f"{url}?topic=payment&id={payment_id}")
+        else:
+            response = Client().post(
+                url, json.dumps({'type': 'payment', 'data': {'id': payment_id}}), content_type='application/json',
+            )
+        return response.status_code == 200
+
+    # O worker em segundo plano ficaria disputando a fila com a medição abaixo
+    with mock.patch('core.webhooks.kick_processor'):
+        received = run_load('webhook_storm:receive', deliver, requests, concurrency)
+
+    pending = MercadoPagoNotification.objects.filter(status='pending').count()
+    processed = run_load(
+        'webhook_storm:process',
+        lambda i: webhooks.process_pending(limit=1, sdk=stand_ins.mercadopago) >= 0,
+        pending, concurrency,
+    )
+    processed.errors = MercadoPagoNotification.objects.exclude(status='done').count()
+    return [received, processed]
+
+
+def otp_flood(stand_ins, requests, concurrency):
+    """
+    Rajada de logins por telefone; 1 em 5 com um número fora da lista. O
+    código vai para o /send_otp do dublê em segundo plano.
+    """
+    phones = _guest_phones()
+
+    def login(i):
+        if i % 5 == 4:
+            phone, expected = f"1199{i:07d}", 200  # volta ao formulário com erro
+        else:
+            phone, expected = phones[i % len(phones)][3:], 302
+        # Um IP por operação: o limite por IP do login (otp.engine) não entra na medição
+        client = Client(HTTP_X_REAL_IP=f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}")
+        response = client.post(reverse('login_phone'), {'country_code': '55', 'phone': phone})
+        return response.status_code == expected
+
+    return [run_load('otp_flood', login, requests, concurrency)]
+
+
+SCENARIOS = {
+    'mass_send': mass_send,
+    'assistant_burst': assistant_burst,
+    'webhook_storm': webhook_storm,
+    'otp_flood': otp_flood,
+}
+
+
+def run(names, stand_ins, requests, concurrency):
+    results = []
+    with stand_ins.active():
+        for name in names:
+            cache.clear()
+            results.extend(SCENARIOS[name](stand_ins, requests, concurrency))
+    return results
+
+
+def format_table(results):
+    header = f"{'cenário':<24}{'ops':>7}{'erros':>7}{'tempo s':>9}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    lines = [header, '-' * len(header)]
+    for r in results:
+        d = r.as_dict()
+        lines.append(
+            f"{d['scenario']:<24}{d['ops']:>7}{d['errors']:>7}{d['wall_s']:>9.2f}{d['ops_per_s']:>9.1f}"
+            f"{d['p50_ms']:>9.1f}{d['p95_ms']:>9.1f}{d['p99_ms']:>9.1f}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,149 @@
+"""
+Cópia dos dados de um db.sqlite3 para o banco configurado (PostgreSQL).
+
+O banco de destino precisa estar migrado e vazio; as tabelas que o próprio
+`migrate` preenche (SEEDED_BY_MIGRATE) são substituídas pelas do SQLite. Cada
+tabela é lida em lotes pela chave primária e gravada com COPY no PostgreSQL
+(bulk_create nos outros bancos). Tudo roda numa transação só no destino:
+se algo falhar, nada fica pela metade. No fim as sequências dos ids são
+ajustadas para continuar depois do maior id copiado.
+"""
+import io
+import json
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connections, models, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+SOURCE_ALIAS = 'sqlite_source'
+DEFAULT_BATCH_SIZE = 2000
+
+SEEDED_BY_MIGRATE = {'contenttypes.contenttype', 'auth.permission', 'core.statcounter'}
+
+
+class CopyError(Exception):
+    pass
+
+
+@contextmanager
+def sqlite_source(path):
+    """Registra o arquivo SQLite como o banco SOURCE_ALIAS enquanto durar o bloco."""
+    connections.settings[SOURCE_ALIAS] = dict(
+        connections['default'].settings_dict,
+        ENGINE='django.db.backends.sqlite3', NAME=str(path), OPTIONS={}, CONN_MAX_AGE=0,
+    )
+    try:
+        yield SOURCE_ALIAS
+    finally:
+        connections[SOURCE_ALIAS].close()
+        del connections[SOURCE_ALIAS]
+        del connections.settings[SOURCE_ALIAS]
+
+
+def copied_models():
+    """Modelos com tabela própria, incluindo as tabelas intermediárias de M2M."""
+    return [
+        model for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy
+    ]
+
+
+def _check_migrations(source, target):
+    applied = {alias: set(MigrationRecorder(connections[alias]).applied_migrations()) for alias in (source, target)}
+    missing = applied[source] - applied[target]
+    if missing:
+        names = ', '.join(sorted(f"{app}.{name}" for app, name in missing))
+        raise CopyError(f"Migrações aplicadas no SQLite e não no destino (rode migrate): {names}")
+
+
+def _copy_text(field, value):
+    """Valor no formato texto do COPY do PostgreSQL."""
+    if value is None:
+        return r'\N'
+    if isinstance(field, models.JSONField):
+        value = json.dumps(value, cls=field.encoder)
+    elif isinstance(value, bool):
+        value = 't' if value else 'f'
+    elif isinstance(value, (bytes, memoryview)):
+        value = '\\x' + bytes(value).hex()
+    elif hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _write_copy(connection, model, fields, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(_copy_text(field, value) for field, value in zip(fields, row)))
+        buffer.write('\n')
+    buffer.seek(0)
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {qn(model._meta.db_table)} ({columns}) FROM STDIN", buffer)
+
+
+def _write_bulk(connection, model, fields, rows):
+    attnames = [field.attname for field in fields]
+    objs = [model(**dict(zip(attnames, row))) for row in rows]
+    model._base_manager.using(connection.alias).bulk_create(objs)
+
+
+def copy_model(model, source, target, batch_size=DEFAULT_BATCH_SIZE):
+    """Copia a tabela de `model` em lotes de batch_size. Retorna quantas linhas."""
+    connection = connections[target]
+    write = _write_copy if connection.vendor == 'postgresql' else _write_bulk
+    fields = model._meta.concrete_fields
+    pk_index = fields.index(model._meta.pk)
+    queryset = model._base_manager.using(source).order_by('pk')
+
+    copied, last_pk = 0, None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(chunk.values_list(*[field.attname for field in fields])[:batch_size])
+        if rows:
+            write(connection, model, fields, rows)
+            copied += len(rows)
+            last_pk = rows[-1][pk_index]
+        if len(rows) < batch_size:
+            return copied
+
+
+def copy_database(source, target='default', batch_size=DEFAULT_BATCH_SIZE, replace=False, progress=None):
+    """
+    Copia todos os modelos de `source` para `target`. Com replace=True apaga
+    antes o que houver no destino. progress(model, linhas) é chamado por tabela.
+    Retorna {label do modelo: linhas copiadas}.
+    """
+    _check_migrations(source, target)
+    models_ = copied_models()
+    connection = connections[target]
+
+    if not replace:
+        busy = [
+            model._meta.label for model in models_
+            if model._meta.label_lower not in SEEDED_BY_MIGRATE and model._base_manager.using(target).exists()
+        ]
+        if busy:
+            raise CopyError(f"O destino já tem dados em: {', '.join(busy)}")
+
+    counts = {}
+    qn = connection.ops.quote_name
+    # As FKs são verificadas só no commit, então a ordem das tabelas não importa
+    with transaction.atomic(using=target):
+        with connection.cursor() as cursor:
+            for model in models_:
+                if replace or model._meta.label_lower in SEEDED_BY_MIGRATE:
+                    cursor.execute(f"DELETE FROM {qn(model._meta.db_table)}")
+        for model in models_:
+            counts[model._meta.label] = copy_model(model, source, target, batch_size)
+            if progress:
+                progress(model, counts[model._meta.label])
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models_):
+                cursor.execute(sql)
+    return counts
@@ -0,0 +1,58 @@
+"""
+Escritas das threads de segundo plano por uma conexão só.
+
+Com SQLITE_WRITE_QUEUE ligado, `run(func, ...)` manda a função para a fila de
+uma thread dedicada ('db-writer'), que executa uma de cada vez, cada uma na
+sua transação, e devolve o resultado (ou a exceção) para quem chamou. Assim
+as threads de segundo plano do processo não disputam o lock de escrita do
+SQLite entre si. Desligado, `run` só executa a função numa transação na
+thread atual.
+
+Não chame `run` de dentro de um transaction.atomic: a transação aberta
+seguraria o lock que a thread de escrita está esperando.
+"""
+import queue
+import threading
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import transaction
+
+from .workers import BackgroundWorker
+
+_jobs = queue.SimpleQueue()
+
+
+def run(func, *args, **kwargs):
+    """Executa func(*args, **kwargs) numa transação e retorna o resultado."""
+    if not settings.SQLITE_WRITE_QUEUE or threading.current_thread() is _worker._thread:
+        with transaction.atomic():
+            return func(*args, **kwargs)
+    future = Future()
+    _jobs.put((future, func, args, kwargs))
+    kick_writer()
+    return future.result()
+
+
+def write_queued():
+    while True:
+        try:
+            future, func, args, kwargs = _jobs.get_nowait()
+        except queue.Empty:
+            return None
+        if not future.set_running_or_notify_cancel():
+            continue
+        try:
+            with transaction.atomic():
+                result = func(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+
+_worker = BackgroundWorker('db-writer', write_queued)
+
+
+def kick_writer():
+    _worker.kick()
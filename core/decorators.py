@@ -1,35 +1,106 @@
 # decorators.py
+import logging
 import os
+from collections import namedtuple
 from django.shortcuts import redirect
 from functools import wraps
 from dotenv import load_dotenv
+from django.core.cache import cache
 from django.shortcuts import redirect
 from core.models import Guest
 from django.utils import timezone
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Telefone dos que vão ter acesso irrestrito ao DB.
 list_string = os.getenv("ADMINS")
 ADMIN_PHONES = []
 if list_string:
     ADMIN_PHONES = [item.strip() for item in list_string.split(',')]
 
+# Dados de autenticação de cada convidado (os campos de Guest que os
+# decorators precisam), no cache para as páginas protegidas não consultarem o
+# banco. Os signals de Guest (core/signals.py) atualizam a entrada a cada
+# save/delete; o TTL limita o atraso de alterações feitas com update()/bulk_create.
+GUEST_AUTH_TTL = 10 * 60
+
+
+class GuestAuth(namedtuple('GuestAuth', ['guest_id', 'session_key', 'active_until', 'phone'])):
+    @property
+    def is_admin(self):
+        # Avaliado na hora: ADMIN_PHONES vem do ambiente e pode mudar entre deploys
+        return self.phone in ADMIN_PHONES
+
+    def is_active_session(self, session_key):
+        """Sessão única: só a última sessão verificada do convidado, e dentro do prazo."""
+        return bool(
+            session_key and self.session_key == session_key
+            and self.active_until and self.active_until > timezone.now()
+        )
+
+
+def guest_auth_cache_key(guest_id):
+    return f"guest-auth:{guest_id}"
+
+
+def cache_guest_auth(guest):
+    auth = GuestAuth(guest.id, guest.active_session_key, guest.active_until, guest.phone_number)
+    cache.set(guest_auth_cache_key(guest.id), auth, GUEST_AUTH_TTL)
+    return auth
+
+
+def forget_guest_auth(guest_id):
+    cache.delete(guest_auth_cache_key(guest_id))
+
+
+def guest_auth(guest_id):
+    """GuestAuth do convidado (cache; banco só na primeira vez), ou None se ele não existe."""
+    auth = cache.get(guest_auth_cache_key(guest_id))
+    if auth is None:
+        guest = Guest.objects.filter(id=guest_id).only('id', 'active_session_key', 'active_until', 'phone_number').first()
+        if guest is None:
+            return None
+        auth = cache_guest_auth(guest)
+    return auth
+
+
+def session_guest_auth(request):
+    guest_id = request.session.get("otp_user_id")
+    if not guest_id:
+        return None
+    return guest_auth(guest_id)
+
+
+def verified_guest_auth(request):
+    """
+    GuestAuth da sessão só se o código OTP já foi verificado nela e ela é a
+    sessão ativa do convidado; senão None.
+    """
+    if not request.session.get("guest_authenticated"):
+        return None
+    auth = session_guest_auth(request)
+    if auth is None or not auth.is_active_session(request.session.session_key):
+        return None
+    return auth
+
+
+def is_wedding_admin(request):
+    """True se a sessão verificada é de um convidado cujo telefone está em ADMIN_PHONES."""
+    auth = verified_guest_auth(request)
+    return auth is not None and auth.is_admin
+
+
 def wedding_admin_required(view_func):
     @wraps(view_func)
     def _wrapped_view(request, *args, **kwargs):
-        guest_id = request.session.get("otp_user_id")
-        if not guest_id:
+        auth = verified_guest_auth(request)
+        if auth is None:
             return redirect('login_phone')
-        try:
-            guest = Guest.objects.get(id=guest_id)
-        except Guest.DoesNotExist:
-            return redirect('login_phone')
-        user_phone = guest.phone_number
-        print("ADMIN_PHONES:", ADMIN_PHONES)
-        print(f"wedding_admin_required: checking access for phone {user_phone}")
-        if user_phone in ADMIN_PHONES:
+        if auth.is_admin:
             return view_func(request, *args, **kwargs)
+        logger.info("Acesso admin negado para %s em %s", auth.phone, request.path)
         return redirect('home') # Send intruders back to the main page
     return _wrapped_view
 
@@ -42,17 +113,12 @@ def guest_required(view_func):
             return redirect('login_phone')
 
         # Require otp_user_id in session
-        guest_id = request.session.get("otp_user_id")
-        if not guest_id:
-            return redirect('login_phone')
-
-        try:
-            guest = Guest.objects.get(id=guest_id)
-        except Guest.DoesNotExist:
+        auth = session_guest_auth(request)
+        if auth is None:
             return redirect('login_phone')
 
         # Allow admins by phone even if not confirmed
-        # if guest.phone_number in ADMIN_PHONES:
+        # if auth.is_admin:
         #     return view_func(request, *args, **kwargs)
 
         # Permite acesso à página de confirmação mesmo se não confirmado
@@ -61,17 +127,11 @@ def guest_required(view_func):
         #         return view_func(request, *args, **kwargs)
         #     return redirect('login_phone')
 
-        # Ensure session key matches the guest's active session and is still valid
-        session_key = request.session.session_key
-        if not session_key:
-            # create/save session to obtain a key
-            request.session.save()
-            session_key = request.session.session_key
-
-        if guest.active_session_key and guest.active_until:
-            if guest.active_until > timezone.now() and session_key == guest.active_session_key:
-                return view_func(request, *args, **kwargs)
+        # Ensure session key matches the guest's active session and is still valid.
+        # Sem session_key a sessão nunca foi salva, então não pode ser a ativa.
+        if auth.is_active_session(request.session.session_key):
+            return view_func(request, *args, **kwargs)
 
         # fallback: not authenticated or session mismatch
         return redirect('login_phone')
-    return _wrapped_view
\ No newline at end of file
+    return _wrapped_view
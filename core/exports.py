@@ -0,0 +1,213 @@
+"""
+Exportação em streaming (CSV e XLSX) para listas de convidados e pagamentos.
+
+As linhas são geradas sob demanda a partir de `.iterator(chunk_size=...)`,
+então a memória não cresce com o número de registros. O XLSX é escrito à
+mão (SpreadsheetML mínimo dentro de um zip em modo streaming) para não
+depender de openpyxl.
+"""
+import csv
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+EXPORT_CHUNK_SIZE = 500
+
+# Linhas acumuladas antes de devolver um pedaço do XLSX ao servidor
+XLSX_FLUSH_ROWS = 200
+
+STATUS_LABELS = {
+    'pending': 'Pendente',
+    'confirmed': 'Confirmado',
+    'rejected': 'Rejeitado',
+}
+
+
+def safe_cell(value):
+    """Evita injeção de fórmulas em planilhas para textos livres (=, +, -, @)."""
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+# ----------------------------------------------------------------------
+# Linhas
+# ----------------------------------------------------------------------
+
+GUEST_HEADER = ['Tipo', 'Nome', 'Convidado principal', 'Telefone', '10/out', '11/out', 'WhatsApp enviado']
+
+
+def guest_rows(guests, extras):
+    """Convidados principais seguidos dos extras (cada queryset já filtrado)."""
+    for guest in guests.order_by('name', 'id').iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            'Principal', safe_cell(guest.name), '', guest.phone_number or '',
+            STATUS_LABELS.get(guest.day1_status, guest.day1_status),
+            STATUS_LABELS.get(guest.day2_status, guest.day2_status),
+            'Sim' if guest.message_sent else 'Não',
+        ]
+    extras = extras.select_related('main_guest').order_by('main_guest__name', 'name', 'id')
+    for extra in extras.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            'Extra', safe_cell(extra.name), safe_cell(extra.main_guest.name), extra.phone_number or '',
+            STATUS_LABELS.get(extra.day1_status, extra.day1_status),
+            STATUS_LABELS.get(extra.day2_status, extra.day2_status),
+            'Sim' if extra.message_sent else 'Não',
+        ]
+
+
+PAGAMENTO_HEADER = ['ID', 'Criado em', 'Presente', 'Valor', 'Status', 'Pagador', 'Email', 'Telefone', 'Mensagem', 'ID Mercado Pago']
+
+
+def pagamento_rows(pagamentos):
+    pagamentos = pagamentos.select_related('presente', 'guest').order_by('-criado_em')
+    for p in pagamentos.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            p.id,
+            timezone.localtime(p.criado_em).strftime('%d/%m/%Y %H:%M'),
+            safe_cell(p.presente.nome if p.presente else 'Contribuição Personalizada'),
+            p.valor,
+            p.get_status_display(),
+            safe_cell(p.nome_pagador or (p.guest.name if p.guest else '')),
+            p.email_pagador or '',
+            p.guest.phone_number if p.guest and p.guest.phone_number else '',
+            safe_cell(p.message or ''),
+            p.mp_payment_id or '',
+        ]
+
+
+# ----------------------------------------------------------------------
+# CSV
+# ----------------------------------------------------------------------
+
+class _Echo:
+    """Pseudo-buffer: csv.writer escreve e nós devolvemos a linha pronta."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo(), delimiter=';')
+    # BOM para o Excel abrir acentos corretamente
+    yield '\ufeff' + writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+# ----------------------------------------------------------------------
+# XLSX
+# ----------------------------------------------------------------------
+
+class _ChunkBuffer:
+    """Destino do ZipFile sem seek: o zip usa data descriptors e só precisamos de tell()."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_workbook(sheet_name):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _xlsx_row(row):
+    cells = []
+    for value in row:
+        if isinstance(value, bool) or value is None:
+            value = '' if value is None else str(value)
+        if isinstance(value, (int, float)) or hasattr(value, 'as_tuple'):
+            cells.append(f'<c><v>{value}</v></c>')
+        else:
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def stream_xlsx(header, rows, sheet_name='Dados'):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            zf.writestr(name, content)
+        zf.writestr('xl/workbook.xml', _xlsx_workbook(sheet_name))
+        yield buffer.drain()
+
+        with zf.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(header).encode('utf-8'))
+            for i, row in enumerate(rows, start=1):
+                sheet.write(_xlsx_row(row).encode('utf-8'))
+                if i % XLSX_FLUSH_ROWS == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+# ----------------------------------------------------------------------
+# Resposta
+# ----------------------------------------------------------------------
+
+def export_response(basename, header, rows, fmt='csv'):
+    stamp = timezone.localtime().strftime('%Y%m%d-%H%M')
+    if fmt == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(header, rows, sheet_name=basename.capitalize()),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        filename = f'{basename}-{stamp}.xlsx'
+    else:
+        response = StreamingHttpResponse(stream_csv(header, rows), content_type='text/csv; charset=utf-8')
+        filename = f'{basename}-{stamp}.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
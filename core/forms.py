@@ -14,12 +14,12 @@ class PagamentoForm(forms.ModelForm):
 class GuestForm(forms.ModelForm):
     class Meta:
         model = Guest
-        fields = ['name', 'phone_number', 'day1_status', 'day2_status', 'is_confirmed', 'message_sent', 'active_session_key', 'active_until']
+        fields = ['name', 'phone_number', 'day1_status', 'day2_status', 'message_sent', 'active_session_key', 'active_until']
 
 class ExtraGuestForm(forms.ModelForm):
     class Meta:
         model = ExtraGuest
-        fields = ['name', 'phone_number', 'day1_status', 'day2_status', 'is_confirmed']
+        fields = ['name', 'phone_number', 'day1_status', 'day2_status']
 
 class WhatsAppMessageForm(forms.Form):
     message = forms.CharField(widget=forms.Textarea, required=True, label="Mensagem WhatsApp")
@@ -0,0 +1,179 @@
+"""
+Limpeza de linhas vencidas, por política de retenção.
+
+Cada política diz quais linhas já podem sair. As exclusões andam em lotes
+pequenos (cada um na sua transação, com uma pausa entre eles), para não
+segurar o lock de escrita do SQLite enquanto o site atende. No fim, com
+SQLite, roda ANALYZE se algo foi apagado e VACUUM quando o espaço livre no
+arquivo passa de VACUUM_MIN_FREE_RATIO (no PostgreSQL isso fica com o
+autovacuum). Também apaga as entradas vencidas do cache em arquivo
+(CACHE_DIR), que o FileBasedCache só remove quando alguém as lê.
+"""
+import os
+import pickle
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Callable
+
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from assistant.models import ConversationMessage
+
+from .models import AdminNotification, MercadoPagoNotification, WhatsAppBatchItem
+
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_PAUSE = 0.05
+
+# VACUUM reescreve o arquivo inteiro: só vale a pena com bastante espaço livre
+VACUUM_MIN_FREE_RATIO = 0.2
+
+
+@dataclass
+class Policy:
+    name: str
+    description: str
+    queryset: Callable  # (agora) -> queryset das linhas a apagar
+
+
+POLICIES = [
+    Policy(
+        'sessions', "sessões expiradas",
+        lambda now: Session.objects.filter(expire_date__lt=now),
+    ),
+    Policy(
+        'conversations', "conversas do assistente paradas há mais de 90 dias",
+        lambda now: ConversationMessage.objects.filter(updated_at__lt=now - timedelta(days=90)),
+    ),
+    Policy(
+        'batch_items', "itens de envios em massa terminados há mais de 30 dias; o resumo do envio fica",
+        # Envios marcados como falhos pela migração 0019 não têm finished_at:
+        # para eles vale a data de criação
+        lambda now: WhatsAppBatchItem.objects.filter(
+            Q(batch__finished_at__lt=now - timedelta(days=30))
+            | Q(batch__finished_at__isnull=True, batch__created_at__lt=now - timedelta(days=30)),
+            batch__status__in=['completed', 'failed'],
+        ),
+    ),
+    Policy(
+        'webhook_notifications', "notificações do Mercado Pago processadas há mais de 30 dias",
+        lambda now: MercadoPagoNotification.objects.filter(
+            status__in=['done', 'failed'], received_at__lt=now - timedelta(days=30),
+        ),
+    ),
+    Policy(
+        'admin_notifications', "avisos aos admins enviados ou desistidos há mais de 30 dias",
+        lambda now: AdminNotification.objects.filter(
+            status__in=['sent', 'failed'], created_at__lt=now - timedelta(days=30),
+        ),
+    ),
+]
+
+
+@dataclass
+class HousekeepingResult:
+    deleted: dict = field(default_factory=dict)
+    size_before: int = None
+    size_after: int = None
+    cache_expired: int = 0
+    analyzed: bool = False
+    vacuumed: bool = False
+
+    @property
+    def bytes_reclaimed(self):
+        if self.size_before is None or self.size_after is None:
+            return None
+        return self.size_before - self.size_after
+
+
+def purge(queryset, chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_PAUSE):
+    """Apaga as linhas do queryset em lotes de chunk_size. Retorna quantas saíram."""
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            deleted += model.objects.filter(pk__in=ids).delete()[0]
+        if len(ids) < chunk_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+def purge_expired_cache(dry_run=False):
+    """Apaga (ou só conta) as entradas vencidas do cache em arquivo. Retorna quantas."""
+    backend = caches['default']
+    if not isinstance(backend, FileBasedCache):
+        return 0
+    now = time.time()
+    expired = 0
+    for path in backend._list_cache_files():
+        try:
+            with open(path, 'rb') as f:
+                # Cada arquivo começa com o instante de expiração (pickle)
+                expires = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            continue  # apagado por outro processo ou ainda sendo gravado
+        if expires is None or expires >= now:
+            continue
+        expired += 1
+        if not dry_run:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return expired
+
+
+def _pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+def sqlite_size():
+    """(bytes do arquivo, fração de páginas livres), ou (None, None) fora do SQLite."""
+    if connection.vendor != 'sqlite':
+        return None, None
+    page_count, page_size = _pragma('page_count'), _pragma('page_size')
+    free = _pragma('freelist_count')
+    return page_count * page_size, (free / page_count if page_count else 0.0)
+
+
+def run(policies=None, chunk_size=DEFAULT_CHUNK_SIZE, pause=DEFAULT_PAUSE, dry_run=False, vacuum='auto'):
+    """
+    Aplica as políticas (todas por padrão). vacuum: 'auto' (só com espaço livre
+    acima de VACUUM_MIN_FREE_RATIO), 'always' ou 'never'.
+    """
+    now = timezone.now()
+    result = HousekeepingResult()
+    result.size_before, _ = sqlite_size()
+
+    for policy in policies or POLICIES:
+        queryset = policy.queryset(now)
+        result.deleted[policy.name] = queryset.count() if dry_run else purge(queryset, chunk_size, pause)
+    result.cache_expired = purge_expired_cache(dry_run)
+
+    if dry_run:
+        return result
+
+    if connection.vendor == 'sqlite':
+        if any(result.deleted.values()):
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            result.analyzed = True
+        _, free_ratio = sqlite_size()
+        if vacuum == 'always' or (vacuum == 'auto' and free_ratio >= VACUUM_MIN_FREE_RATIO):
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+            result.vacuumed = True
+        result.size_after, _ = sqlite_size()
+    return result
+
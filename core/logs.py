@@ -0,0 +1,133 @@
+"""
+Logging estruturado (uma linha JSON por registro) sem bloquear a requisição.
+
+`QueueHandler` só coloca o registro numa fila; uma thread (QueueListener)
+formata e escreve no stderr, que o gunicorn/journald recolhe. Antes de entrar
+na fila o registro passa por:
+
+- `SamplingFilter`: descarta uma fração dos DEBUG/INFO de loggers barulhentos
+  (WARNING para cima sempre passa);
+- `redact`: mascara telefones e JIDs do WhatsApp na mensagem, no traceback e
+  nos campos extras.
+
+A configuração fica em settings.LOGGING.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+from datetime import datetime, timezone
+
+# +5511999998888 (com +) ou 5511999998888 (com DDI, como vai para o WhatsApp).
+# Sem o + exige 12+ dígitos para não pegar IDs de pagamento do Mercado Pago.
+PHONE_RE = re.compile(r'(?<![\w.])(?:\+\d{10,15}|\d{12,15})(?!\d)')
+# 5511999998888@s.whatsapp.net, 5511999998888:12@s.whatsapp.net, 1203630@g.us, 1234@lid
+JID_RE = re.compile(r'\b\d+(?::\d+)?@(s\.whatsapp\.net|g\.us|lid|c\.us)\b')
+
+# Atributos que todo LogRecord tem; o resto veio de `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+def _mask(digits):
+    return '***' + digits[-4:]
+
+
+def redact(value):
+    """Mascara telefones e JIDs (mantém só os 4 últimos dígitos)."""
+    if isinstance(value, str):
+        value = JID_RE.sub(lambda m: _mask(m.group(0).split('@')[0].split(':')[0]) + '@' + m.group(1), value)
+        return PHONE_RE.sub(lambda m: _mask(m.group(0)), value)
+    if isinstance(value, dict):
+        return {k: redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deixa passar só `rate` dos registros abaixo de WARNING, por prefixo de
+    logger: rates={'assistant': 0.1} amostra 'assistant.ai' e 'assistant.tools'.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        # Prefixo mais específico primeiro
+        self.rates = sorted((rates or {}).items(), key=lambda item: -len(item[0]))
+
+    def rate_for(self, name):
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + '.'):
+                return rate
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        return json.dumps(redact(data), ensure_ascii=False, default=str)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Handler não bloqueante: a formatação JSON e a escrita acontecem na thread
+    do QueueListener. Criado pelo dictConfig (settings.LOGGING).
+    """
+
+    def __init__(self, stream=None, sample_rates=None):
+        super().__init__(queue.SimpleQueue())
+        if isinstance(sample_rates, str):
+            sample_rates = parse_sample_rates(sample_rates)
+        self.addFilter(SamplingFilter(sample_rates))
+        target = logging.StreamHandler(stream or sys.stderr)
+        target.setFormatter(JsonFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        # O padrão do QueueHandler junta o traceback na mensagem; aqui o
+        # registro atravessa a fila já resolvido, mas com os campos separados.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        # logging.shutdown() chama close() na saída do processo: esvazia a fila
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+
+def parse_sample_rates(value):
+    """'assistant=0.1,core.payments=0.25' -> {'assistant': 0.1, 'core.payments': 0.25}"""
+    rates = {}
+    for item in (value or '').split(','):
+        name, sep, rate = item.partition('=')
+        if sep and name.strip():
+            rates[name.strip()] = float(rate)
+    return rates
@@ -0,0 +1,75 @@
+import json
+import logging
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark ponta a ponta (envio em massa, assistente, webhooks, login) com dublês locais do "
+        "WhatsApp, Gemini e Mercado Pago. Usa um banco de teste descartável; nada sai da máquina."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*',
+                            help=f"Cenários a rodar: {', '.join(benchmark.SCENARIOS)} (padrão: todos).")
+        parser.add_argument('--requests', type=int, default=200, help="Operações por cenário (padrão: 200).")
+        parser.add_argument('--concurrency', type=int, default=8, help="Threads simultâneas (padrão: 8).")
+        parser.add_argument('--guests', type=int, default=200, help="Convidados criados no banco de teste.")
+        for name, latency in (('sidecar', 50), ('gemini', 400), ('mp', 150)):
+            parser.add_argument(f'--{name}-latency', type=float, default=latency, help=f"Latência do dublê em ms (padrão: {latency}).")
+            parser.add_argument(f'--{name}-jitter', type=float, help="Variação da latência em ms (padrão: 20%% da latência).")
+            parser.add_argument(f'--{name}-errors', type=float, default=0.0, help="Fração das chamadas que falham (0 a 1).")
+        parser.add_argument('--json', action='store_true', help="Imprime o resultado em JSON.")
+
+    def _fault(self, options, name):
+        latency, jitter = options[f'{name}_latency'], options[f'{name}_jitter']
+        return benchmark.Fault(latency, latency / 5 if jitter is None else jitter, options[f'{name}_errors'])
+
+    def handle(self, *args, **options):
+        names = options['scenarios'] or list(benchmark.SCENARIOS)
+        unknown = set(names) - set(benchmark.SCENARIOS)
+        if unknown:
+            raise CommandError(f"Cenário desconhecido: {', '.join(sorted(unknown))}")
+        stand_ins = benchmark.StandIns(
+            sidecar_fault=self._fault(options, 'sidecar'),
+            gemini_fault=self._fault(options, 'gemini'),
+            mercadopago_fault=self._fault(options, 'mp'),
+        )
+
+        # Banco de teste em arquivo (o SQLite em memória não é compartilhado entre threads)
+        test_db = None
+        if connection.vendor == 'sqlite':
+            fd, test_db = tempfile.mkstemp(prefix='benchmark-', suffix='.sqlite3')
+            os.close(fd)
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = test_db
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        # Falhas injetadas geram muito log; com -v 2 elas aparecem
+        if options['verbosity'] < 2:
+            logging.disable(logging.CRITICAL)
+        try:
+            benchmark.seed(options['guests'])
+            results = benchmark.run(names, stand_ins, options['requests'], options['concurrency'])
+        finally:
+            logging.disable(logging.NOTSET)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            if test_db and os.path.exists(test_db):
+                os.remove(test_db)
+
+        if options['json']:
+            self.stdout.write(json.dumps([r.as_dict() for r in results], indent=2))
+            return
+        self.stdout.write(
+            f"Dublês: WhatsApp {stand_ins.sidecar.fault} | Gemini {stand_ins.gemini.fault} | "
+            f"Mercado Pago {stand_ins.mercadopago.fault}; concorrência {options['concurrency']}\n"
+        )
+        self.stdout.write(benchmark.format_table(results))
@@ -0,0 +1,46 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import dbcopy
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia os dados de um db.sqlite3 para o banco configurado em DATABASE_URL. "
+        "Rode `migrate` no destino antes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default=str(settings.BASE_DIR / 'db.sqlite3'),
+                            help="Arquivo SQLite de origem (padrão: db.sqlite3 do projeto).")
+        parser.add_argument('--batch-size', type=int, default=dbcopy.DEFAULT_BATCH_SIZE,
+                            help="Linhas lidas e gravadas por vez.")
+        parser.add_argument('--replace', action='store_true',
+                            help="Apaga o que já existir no destino antes de copiar.")
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not os.path.isfile(source):
+            raise CommandError(f"Arquivo não encontrado: {source}")
+        if connection.vendor == 'sqlite' and os.path.abspath(str(connection.settings_dict['NAME'])) == os.path.abspath(source):
+            raise CommandError("Origem e destino são o mesmo arquivo; configure DATABASE_URL.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size precisa ser positivo.")
+
+        def progress(model, count):
+            self.stdout.write(f"{model._meta.label}: {count} linhas")
+
+        with dbcopy.sqlite_source(source) as alias:
+            try:
+                counts = dbcopy.copy_database(
+                    alias, batch_size=options['batch_size'], replace=options['replace'], progress=progress,
+                )
+            except dbcopy.CopyError as exc:
+                raise CommandError(str(exc))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(counts.values())} linhas copiadas em {len(counts)} tabelas para {connection.vendor}."
+        ))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import housekeeping
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga linhas vencidas (sessões, conversas antigas, itens de envios em massa, notificações) em lotes "
+        "e, no SQLite, roda ANALYZE/VACUUM quando vale a pena."
+    )
+
+    def add_arguments(self, parser):
+        names = ', '.join(p.name for p in housekeeping.POLICIES)
+        parser.add_argument('policies', nargs='*', help=f"Políticas a aplicar: {names} (padrão: todas).")
+        parser.add_argument('--chunk-size', type=int, default=housekeeping.DEFAULT_CHUNK_SIZE,
+                            help="Linhas apagadas por transação.")
+        parser.add_argument('--pause', type=float, default=housekeeping.DEFAULT_PAUSE,
+                            help="Pausa em segundos entre os lotes.")
+        parser.add_argument('--vacuum', choices=['auto', 'always', 'never'], default='auto',
+                            help="auto: só com muito espaço livre no arquivo (padrão).")
+        parser.add_argument('--dry-run', action='store_true', help="Só conta o que seria apagado.")
+
+    def handle(self, *args, **options):
+        by_name = {p.name: p for p in housekeeping.POLICIES}
+        unknown = set(options['policies']) - set(by_name)
+        if unknown:
+            raise CommandError(f"Política desconhecida: {', '.join(sorted(unknown))}")
+        policies = [by_name[name] for name in options['policies']] or None
+
+        result = housekeeping.run(
+            policies,
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+            vacuum=options['vacuum'],
+        )
+
+        prefix = "[dry-run] " if options['dry_run'] else ""
+        for name, count in result.deleted.items():
+            self.stdout.write(f"{prefix}{name}: {count} linhas ({by_name[name].description})")
+        if result.cache_expired:
+            self.stdout.write(f"{prefix}cache: {result.cache_expired} entradas vencidas")
+        if result.analyzed:
+            self.stdout.write("ANALYZE executado.")
+        if result.vacuumed:
+            self.stdout.write("VACUUM executado.")
+        summary = f"{prefix}{sum(result.deleted.values())} linhas apagadas"
+        if result.bytes_reclaimed is not None:
+            summary += f", {result.bytes_reclaimed / 1024:.0f} KiB devolvidos ao disco"
+        self.stdout.write(self.style.SUCCESS(summary + "."))
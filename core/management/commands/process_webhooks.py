@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.webhooks import process_pending
+
+
+class Command(BaseCommand):
+    help = "Processa as notificações pendentes do Mercado Pago (para rodar via cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None, help="Máximo de notificações a processar.")
+
+    def handle(self, *args, **options):
+        processed = process_pending(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f"{processed} notificações processadas."))
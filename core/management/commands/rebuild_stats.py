@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recalcula os contadores do painel (StatCounter) a partir das tabelas."
+
+    def handle(self, *args, **options):
+        counters = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f"{len(counters)} contadores recalculados."))
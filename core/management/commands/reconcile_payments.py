@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import reconciliation
+
+
+class Command(BaseCommand):
+    help = "Consulta no Mercado Pago os pagamentos pendentes antigos e atualiza o status (webhooks perdidos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=30,
+                            help="Só pagamentos pendentes há mais de N minutos (padrão: 30).")
+        parser.add_argument('--max-age', type=int, default=30,
+                            help="Ignora pagamentos criados há mais de N dias (padrão: 30).")
+        parser.add_argument('--page-size', type=int, default=reconciliation.DEFAULT_PAGE_SIZE,
+                            help="Pagamentos por página da busca no Mercado Pago.")
+        parser.add_argument('--concurrency', type=int, default=reconciliation.DEFAULT_CONCURRENCY,
+                            help="Páginas buscadas em paralelo.")
+        parser.add_argument('--dry-run', action='store_true', help="Só mostra o que mudaria.")
+
+    def handle(self, *args, **options):
+        pagamentos = reconciliation.stale_pending(
+            stale_after=timedelta(minutes=options['older_than']),
+            max_age=timedelta(days=options['max_age']),
+        )
+        try:
+            result = reconciliation.reconcile(
+                pagamentos,
+                page_size=options['page_size'],
+                concurrency=options['concurrency'],
+                dry_run=options['dry_run'],
+            )
+        except Exception as exc:
+            raise CommandError(f"Busca no Mercado Pago falhou: {exc}") from exc
+        prefix = "[dry-run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{result.checked} verificados, {result.updated} atualizados "
+            f"({result.approved} aprovados), {result.not_found} sem pagamento no Mercado Pago "
+            f"({result.pages} consultas)."
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.models import AdminNotification
+from core.notifications import send_pending
+
+
+class Command(BaseCommand):
+    help = "Envia os avisos de presente pendentes para os admins (reenvia os que falharam)."
+
+    def handle(self, *args, **options):
+        send_pending()
+        pending = AdminNotification.objects.filter(status='pending').count()
+        self.stdout.write(self.style.SUCCESS(f"Avisos enviados; {pending} ainda pendentes."))
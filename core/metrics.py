@@ -0,0 +1,292 @@
+"""
+Métricas leves (contadores, gauges e histogramas) no formato do Prometheus.
+
+Cada processo acumula as amostras em memória. Com METRICS_DIR configurado,
+elas são gravadas (no máximo uma vez por FLUSH_INTERVAL) em
+`METRICS_DIR/metrics-<pid>.json`, e o endpoint /metrics soma os arquivos de
+todos os workers do gunicorn. Contadores e histogramas de workers que já
+morreram continuam somando; gauges só contam para processos vivos.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+FLUSH_INTERVAL = 1.0
+
+
+def _label_key(labelnames, labels):
+    missing = set(labelnames) - set(labels)
+    if missing:
+        raise ValueError(f"Labels faltando: {', '.join(sorted(missing))}")
+    return tuple((name, str(labels[name])) for name in labelnames)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def sample_names(self):
+        return (self.name,)
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry._add(self.name, _label_key(self.labelnames, labels), amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        self.registry._set(self.name, _label_key(self.labelnames, labels), value)
+
+    def inc(self, amount=1, **labels):
+        self.registry._add(self.name, _label_key(self.labelnames, labels), amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def sample_names(self):
+        return (f"{self.name}_bucket", f"{self.name}_sum", f"{self.name}_count")
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        updates = [(f"{self.name}_sum", key, value), (f"{self.name}_count", key, 1)]
+        for bound in self.buckets:
+            if value <= bound:
+                updates.append((f"{self.name}_bucket", key + (('le', _format_value(bound)),), 1))
+        self.registry._add_many(updates)
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Mede o bloco. O dict de labels é devolvido para ser ajustado dentro
+        dele (ex.: outcome); se o bloco levantar, outcome vira "error".
+        """
+        started = time.perf_counter()
+        try:
+            yield labels
+        except Exception:
+            if 'outcome' in self.labelnames:
+                labels['outcome'] = 'error'
+            raise
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._samples = {}
+        self._flush_timer = None
+
+    # -- definição ---------------------------------------------------------
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(self, name, *args, **kwargs)
+            return self._metrics[name]
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    # -- atualização -------------------------------------------------------
+
+    def _add(self, name, key, amount):
+        self._add_many([(name, key, amount)])
+
+    def _add_many(self, updates):
+        with self._lock:
+            for name, key, amount in updates:
+                self._samples[(name, key)] = self._samples.get((name, key), 0) + amount
+            self._schedule_flush()
+
+    def _set(self, name, key, value):
+        with self._lock:
+            self._samples[(name, key)] = value
+            self._schedule_flush()
+
+    # -- persistência entre processos ---------------------------------------
+
+    def _directory(self):
+        return getattr(settings, 'METRICS_DIR', None) or None
+
+    def _schedule_flush(self):
+        # Chamado com o lock; no máximo uma gravação por FLUSH_INTERVAL
+        if self._flush_timer is None and self._directory():
+            self._flush_timer = threading.Timer(FLUSH_INTERVAL, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _gauge_names(self):
+        return {m.name for m in self._metrics.values() if m.kind == 'gauge'}
+
+    def flush(self):
+        directory = self._directory()
+        with self._lock:
+            self._flush_timer = None
+            samples = [[name, list(map(list, key)), value] for (name, key), value in self._samples.items()]
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'pid': os.getpid(), 'samples': samples}, f)
+        os.replace(tmp_path, os.path.join(directory, f"metrics-{os.getpid()}.json"))
+
+    def collect(self):
+        """Amostras somadas de todos os processos: {(nome, labels): valor}."""
+        directory = self._directory()
+        if not directory:
+            with self._lock:
+                return dict(self._samples)
+
+        self.flush()
+        gauges = self._gauge_names()
+        merged = {}
+        for filename in os.listdir(directory):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(data.get('pid'))
+            for name, key, value in data.get('samples', []):
+                if name in gauges and not alive:
+                    continue
+                key = (name, tuple(tuple(pair) for pair in key))
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    # -- exposição ---------------------------------------------------------
+
+    def render(self):
+        samples = self.collect()
+        by_name = {}
+        for (name, key), value in samples.items():
+            by_name.setdefault(name, []).append((key, value))
+
+        lines = []
+        for metric in sorted(self._metrics.values(), key=lambda m: m.name):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name in metric.sample_names():
+                for key, value in sorted(by_name.get(sample_name, []), key=_sample_sort_key):
+                    lines.append(f"{sample_name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _sample_sort_key(item):
+    key, _ = item
+    # ordena os buckets numericamente (le="+Inf" por último)
+    return tuple((name, float(value) if name == 'le' else 0.0, value) for name, value in key)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(float(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in key) + '}'
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+# ----------------------------------------------------------------------
+# Métricas da aplicação
+# ----------------------------------------------------------------------
+
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+HTTP_REQUEST_SECONDS = histogram(
+    'http_request_duration_seconds', 'Latência das requisições por view (URL name).',
+    ['view', 'method', 'status'],
+)
+HTTP_REQUEST_QUERIES = histogram(
+    'http_request_db_queries', 'Consultas SQL executadas por requisição.',
+    ['view'], buckets=QUERY_BUCKETS,
+)
+LLM_CALL_SECONDS = histogram(
+    'llm_call_duration_seconds', 'Latência das chamadas ao LLM por provedor e ferramenta.',
+    ['provider', 'tool', 'outcome'],
+)
+ASSISTANT_TOOL_SECONDS = histogram(
+    'assistant_tool_duration_seconds', 'Tempo de execução das ferramentas do assistente.',
+    ['tool', 'outcome'],
+)
+SIDECAR_SEND_SECONDS = histogram(
+    'whatsapp_sidecar_request_duration_seconds', 'Latência das chamadas ao serviço de WhatsApp.',
+    ['endpoint', 'outcome'],
+)
+WEBHOOK_PROCESS_SECONDS = histogram(
+    'mercadopago_webhook_processing_seconds', 'Tempo para processar uma notificação do Mercado Pago.',
+    ['outcome'],
+)
+MERCADOPAGO_REQUEST_SECONDS = histogram(
+    'mercadopago_request_duration_seconds', 'Latência das chamadas à API do Mercado Pago.',
+    ['method', 'endpoint', 'status'],
+)
+
+
+def endpoint_label(path):
+    """Troca IDs numéricos por :id para não explodir a cardinalidade."""
+    return re.sub(r'/\d+(?=/|$)', '/:id', path)
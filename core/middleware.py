@@ -0,0 +1,96 @@
+import cProfile
+import io
+import logging
+import pstats
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+
+from . import metrics, profiling
+from .decorators import is_wedding_admin
+
+logger = logging.getLogger('core.slow_requests')
+
+PROFILE_PARAM = '_profile'
+PROFILE_TOP_FUNCTIONS = 40
+PROFILE_TOP_QUERIES = 25
+
+
+class ProfilingMiddleware:
+    """
+    Mede cada requisição (SQL, templates, HTTP externo), alimenta as métricas
+    de /metrics e registra as requisições acima de SLOW_REQUEST_MS.
+
+    Admins podem abrir qualquer página GET com `?_profile=1` para receber,
+    no lugar da página, o relatório com o cProfile da view e as consultas SQL
+    agrupadas.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = profiling.RequestProfile(keep_queries=PROFILE_PARAM in request.GET)
+        with profiling.activate(profile), connection.execute_wrapper(profile.execute):
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unmatched'
+        metrics.HTTP_REQUEST_SECONDS.observe(profile.elapsed, view=view, method=request.method, status=response.status_code)
+        metrics.HTTP_REQUEST_QUERIES.observe(profile.queries, view=view)
+
+        if profile.elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+            data = profile.as_dict()
+            logger.warning(
+                "Requisição lenta: %s %s view=%s status=%s duration_ms=%s queries=%s db_ms=%s template_ms=%s http_ms=%s http_calls=%s",
+                request.method, request.path, view, response.status_code, data['duration_ms'], data['queries'],
+                data['db_ms'], data['template_ms'], data['http_ms'], data['http_calls'],
+                extra={'request_profile': dict(data, method=request.method, path=request.path, view=view,
+                                               status=response.status_code)},
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method != 'GET' or request.GET.get(PROFILE_PARAM) != '1':
+            return None
+        if not is_wedding_admin(request):
+            return None
+
+        profile = profiling.current()
+        profiler = cProfile.Profile()
+        response = profiler.runcall(view_func, request, *view_args, **view_kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = profiler.runcall(response.render)
+        return HttpResponse(_report(request, response, profile, profiler), content_type='text/plain; charset=utf-8')
+
+
+def _normalize_sql(sql):
+    return re.sub(r"'[^']*'|\b\d+\b", '?', sql)
+
+
+def _report(request, response, profile, profiler):
+    data = profile.as_dict()
+    out = io.StringIO()
+    out.write(f"{request.method} {request.path} -> {response.status_code}\n")
+    out.write(
+        f"duração {data['duration_ms']}ms | {data['queries']} consultas (banco {data['db_ms']}ms) | "
+        f"templates {data['template_ms']}ms | HTTP externo {data['http_ms']}ms em {data['http_calls']} chamadas\n\n"
+    )
+
+    grouped = defaultdict(lambda: [0, 0.0])
+    for sql, elapsed in profile.sql:
+        entry = grouped[_normalize_sql(sql)]
+        entry[0] += 1
+        entry[1] += elapsed
+    out.write("Consultas SQL (agrupadas, mais custosas primeiro):\n")
+    out.write(f"{'n':>5} {'total ms':>9}  sql\n")
+    for sql, (count, total) in sorted(grouped.items(), key=lambda item: -item[1][1])[:PROFILE_TOP_QUERIES]:
+        out.write(f"{count:>5} {total * 1000:>9.1f}  {sql}\n")
+
+    out.write(f"\ncProfile (top {PROFILE_TOP_FUNCTIONS} por tempo cumulativo):\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    return out.getvalue()
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:29
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def populate_counters(apps, schema_editor):
+    # Mesma lógica de core.stats.compute_stats, mas com os modelos históricos
+    StatCounter = apps.get_model('core', 'StatCounter')
+    db_alias = schema_editor.connection.alias
+    counters = {}
+
+    def add(key, count, total=Decimal('0')):
+        c, t = counters.get(key, (0, Decimal('0')))
+        counters[key] = (c + count, t + total)
+
+    for model_name in ('Guest', 'ExtraGuest'):
+        model = apps.get_model('core', model_name)
+        for day in (1, 2):
+            for status in ('pending', 'confirmed', 'rejected'):
+                n = model.objects.using(db_alias).filter(**{f'day{day}_status': status}).count()
+                add(f'rsvp:day{day}:{status}', n)
+
+    Pagamento = apps.get_model('core', 'Pagamento')
+    rows = Pagamento.objects.using(db_alias).values('presente_id', 'status').annotate(n=Count('id'), soma=Sum('valor'))
+    for row in rows:
+        soma = row['soma'] or Decimal('0')
+        add(f"gift:{row['status']}", row['n'], soma)
+        if row['presente_id'] is None:
+            add(f"gift:{row['status']}:custom", row['n'], soma)
+        else:
+            add(f"gift:{row['status']}:presente:{row['presente_id']}", row['n'], soma)
+
+    StatCounter.objects.using(db_alias).bulk_create(
+        [StatCounter(key=key, count=count, total=total) for key, (count, total) in counters.items()]
+        + [StatCounter(key='meta:built', count=1)]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_extraguest_message_sent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Contador do Painel',
+                'verbose_name_plural': 'Contadores do Painel',
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_statcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MercadoPagoNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(blank=True, default='', max_length=50)),
+                ('resource_id', models.CharField(blank=True, default='', max_length=255)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('processing', 'Processando'), ('done', 'Processada'), ('failed', 'Falhou')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Notificação do Mercado Pago',
+                'verbose_name_plural': 'Notificações do Mercado Pago',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='core_mercad_status_e028c8_idx')],
+            },
+        ),
+    ]
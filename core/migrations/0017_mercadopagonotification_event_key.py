@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_mercadopagonotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mercadopagonotification',
+            name='event_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=40),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_mercadopagonotification_event_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.CharField(max_length=50)),
+                ('text', models.TextField()),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('sending', 'Enviando'), ('sent', 'Enviada'), ('failed', 'Falhou')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('claim_token', models.CharField(blank=True, default='', max_length=32)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('pagamento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='admin_notifications', to='core.pagamento')),
+            ],
+            options={
+                'verbose_name': 'Aviso para admin',
+                'verbose_name_plural': 'Avisos para admins',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'recipient'], name='core_adminn_status_d7bf3e_idx')],
+            },
+        ),
+    ]
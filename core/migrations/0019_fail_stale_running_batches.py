@@ -0,0 +1,25 @@
+# Generated by Django 4.2.27 on 2026-10-19 14:07
+
+from django.db import migrations
+
+
+def fail_stale_running_batches(apps, schema_editor):
+    # Uma thread de envio que morreu deixa o batch em 'running' para sempre;
+    # só o mais recente pode continuar assim com a restrição nova.
+    WhatsAppBatch = apps.get_model('core', 'WhatsAppBatch')
+    running = WhatsAppBatch.objects.using(schema_editor.connection.alias).filter(status='running')
+    latest = running.order_by('-id').values_list('id', flat=True).first()
+    running.exclude(id=latest).update(status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_adminnotification'),
+    ]
+
+    # Separada da 0020: no PostgreSQL o UPDATE e o ALTER TABLE na mesma
+    # transação podem falhar com "pending trigger events"
+    operations = [
+        migrations.RunPython(fail_stale_running_batches, migrations.RunPython.noop),
+    ]
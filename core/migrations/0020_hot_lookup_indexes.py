@@ -0,0 +1,49 @@
+# Generated by Django 4.2.27 on 2026-10-19 14:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_fail_stale_running_batches'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='extraguest',
+            index=models.Index(fields=['day1_status'], name='core_extra_day1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='extraguest',
+            index=models.Index(fields=['day2_status'], name='core_extra_day2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='extraguest',
+            index=models.Index(condition=models.Q(('message_sent', False)), fields=['message_sent'], name='core_extra_not_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['day1_status'], name='core_guest_day1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['day2_status'], name='core_guest_day2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(condition=models.Q(('message_sent', False)), fields=['message_sent'], name='core_guest_not_sent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['status', 'criado_em'], name='core_pagame_status_293af7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='whatsappbatchitem',
+            index=models.Index(fields=['batch', 'status'], name='core_whatsa_batch_i_df5277_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='whatsappbatch',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'running')), fields=('status',), name='core_single_running_batch'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.27 on 2026-10-19 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='extraguest',
+            name='core_extra_day1_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='guest',
+            name='core_guest_day1_idx',
+        ),
+        migrations.RemoveField(
+            model_name='extraguest',
+            name='is_confirmed',
+        ),
+        migrations.RemoveField(
+            model_name='extraguest',
+            name='is_rejected',
+        ),
+        migrations.RemoveField(
+            model_name='extraguest',
+            name='not_answered',
+        ),
+        migrations.RemoveField(
+            model_name='guest',
+            name='is_confirmed',
+        ),
+        migrations.RemoveField(
+            model_name='guest',
+            name='is_rejected',
+        ),
+        migrations.RemoveField(
+            model_name='guest',
+            name='not_answered',
+        ),
+        migrations.AddIndex(
+            model_name='extraguest',
+            index=models.Index(fields=['day1_status', 'day2_status'], name='core_extra_rsvp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['day1_status', 'day2_status'], name='core_guest_rsvp_idx'),
+        ),
+    ]
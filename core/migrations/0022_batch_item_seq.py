@@ -0,0 +1,39 @@
+# Generated by Django 4.2.27 on 2026-10-19 14:15
+
+from django.db import migrations, models
+
+
+def number_finished_items(apps, schema_editor):
+    # Batches antigos: numera os itens já enviados/com falha na ordem de envio
+    WhatsAppBatchItem = apps.get_model('core', 'WhatsAppBatchItem')
+    items = WhatsAppBatchItem.objects.using(schema_editor.connection.alias)
+    finished = items.exclude(status='pending').order_by('batch_id', 'id').only('id', 'batch_id')
+    seq, batch_id, changed = 0, None, []
+    for item in finished.iterator():
+        seq = seq + 1 if item.batch_id == batch_id else 1
+        batch_id = item.batch_id
+        item.seq = seq
+        changed.append(item)
+    items.bulk_update(changed, ['seq'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_rsvp_flags_from_day_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='whatsappbatchitem',
+            name='seq',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='whatsappbatchitem',
+            index=models.Index(fields=['batch', 'seq'], name='core_batch_item_seq_idx'),
+        ),
+        # Por último: no PostgreSQL um ALTER TABLE depois do UPDATE na mesma
+        # transação pode falhar com "pending trigger events"
+        migrations.RunPython(number_finished_items, migrations.RunPython.noop),
+    ]
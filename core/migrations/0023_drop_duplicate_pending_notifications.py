@@ -0,0 +1,26 @@
+# Generated by Django 4.2.27 on 2026-10-19 14:36
+
+from django.db import migrations
+from django.db.models import Min
+
+
+def drop_duplicate_pending_notifications(apps, schema_editor):
+    # Cópias da mesma entrega ainda na fila: fica a mais antiga, que é a que
+    # o processador pegaria primeiro
+    MercadoPagoNotification = apps.get_model('core', 'MercadoPagoNotification')
+    pending = MercadoPagoNotification.objects.using(schema_editor.connection.alias).filter(status='pending')
+    keep = pending.values('topic', 'resource_id').annotate(first=Min('id')).values_list('first', flat=True)
+    pending.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_batch_item_seq'),
+    ]
+
+    # Separada da 0024: no PostgreSQL o DELETE e o ALTER TABLE na mesma
+    # transação podem falhar com "pending trigger events"
+    operations = [
+        migrations.RunPython(drop_duplicate_pending_notifications, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-19 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_drop_duplicate_pending_notifications'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mercadopagonotification',
+            index=models.Index(fields=['topic', 'resource_id'], name='core_mp_notification_res_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mercadopagonotification',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('topic', 'resource_id'), name='core_mp_notification_one_pending'),
+        ),
+    ]
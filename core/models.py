@@ -8,6 +8,44 @@ DAY_STATUS_CHOICES = [
     ('rejected', 'Rejeitado'),
 ]
 
+
+def both_days(status):
+    """Q de quem tem o mesmo status nos dois dias (índice em (day1_status, day2_status))."""
+    return models.Q(day1_status=status, day2_status=status)
+
+
+class RSVPQuerySet(models.QuerySet):
+    """
+    Confirmado, recusado e sem resposta são derivados de day1_status e
+    day2_status, no próprio SQL; não há colunas separadas para ficarem
+    desatualizadas.
+    """
+
+    def confirmed(self):
+        return self.filter(both_days('confirmed'))
+
+    def rejected(self):
+        return self.filter(both_days('rejected'))
+
+    def not_answered(self):
+        return self.filter(both_days('pending'))
+
+
+class RSVPFlagsMixin:
+    """As mesmas derivações de RSVPQuerySet, para uma instância já carregada."""
+
+    @property
+    def is_confirmed(self):
+        return self.day1_status == 'confirmed' and self.day2_status == 'confirmed'
+
+    @property
+    def is_rejected(self):
+        return self.day1_status == 'rejected' and self.day2_status == 'rejected'
+
+    @property
+    def not_answered(self):
+        return self.day1_status == 'pending' and self.day2_status == 'pending'
+
 class Presente(models.Model):
     nome = models.CharField(max_length=255)
     descricao = models.TextField(blank=True, null=True)
@@ -54,39 +92,55 @@ class Pagamento(models.Model):
         verbose_name = "Pagamento"
         verbose_name_plural = "Pagamentos"
         ordering = ['-criado_em']
+        # Filtro por status (exports, reconciliação dos pendentes por data)
+        indexes = [models.Index(fields=['status', 'criado_em'])]
 
-class Guest(models.Model):
+class Guest(RSVPFlagsMixin, models.Model):
     name = models.CharField(max_length=100)
     phone_number = models.CharField(max_length=20, unique=True, blank=True, null=True)
     jid = models.CharField(max_length=64, unique=True, blank=True, null=True, help_text="WhatsApp JID, e.g. 115831006589136@lid or 5511999999999@s.whatsapp.net")
     day1_status = models.CharField(max_length=10, choices=DAY_STATUS_CHOICES, default='pending')
     day2_status = models.CharField(max_length=10, choices=DAY_STATUS_CHOICES, default='pending')
-    is_confirmed = models.BooleanField(default=False)
-    is_rejected = models.BooleanField(default=False)
-    not_answered = models.BooleanField(default=True)
     message_sent = models.BooleanField(default=False)
     # Track the session key currently associated with this guest (one active session)
     active_session_key = models.CharField(max_length=40, null=True, blank=True)
     # When the active session expires; used to allow new logins after timeout
     active_until = models.DateTimeField(null=True, blank=True)
 
+    objects = RSVPQuerySet.as_manager()
+
+    class Meta:
+        # Filtros do envio em massa e dos exports (filter_by_rsvp) e de
+        # RSVPQuerySet; o par (day1, day2) também serve aos filtros só do dia 1
+        indexes = [
+            models.Index(fields=['day1_status', 'day2_status'], name='core_guest_rsvp_idx'),
+            models.Index(fields=['day2_status'], name='core_guest_day2_idx'),
+            models.Index(fields=['message_sent'], condition=models.Q(message_sent=False), name='core_guest_not_sent_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
 # Extra guests attached to a main guest
-class ExtraGuest(models.Model):
+class ExtraGuest(RSVPFlagsMixin, models.Model):
     main_guest = models.ForeignKey(Guest, on_delete=models.CASCADE, related_name='extra_guests')
     name = models.CharField(max_length=100)
     phone_number = models.CharField(max_length=20, blank=True, null=True, unique=True)
     jid = models.CharField(max_length=64, unique=True, blank=True, null=True, help_text="WhatsApp JID, e.g. 115831006589136@lid or 5511999999999@s.whatsapp.net")
     day1_status = models.CharField(max_length=10, choices=DAY_STATUS_CHOICES, default='pending')
     day2_status = models.CharField(max_length=10, choices=DAY_STATUS_CHOICES, default='pending')
-    is_confirmed = models.BooleanField(default=False)
-    is_rejected = models.BooleanField(default=False)
-    not_answered = models.BooleanField(default=True)
     message_sent = models.BooleanField(default=False)
 
+    objects = RSVPQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['day1_status', 'day2_status'], name='core_extra_rsvp_idx'),
+            models.Index(fields=['day2_status'], name='core_extra_day2_idx'),
+            models.Index(fields=['message_sent'], condition=models.Q(message_sent=False), name='core_extra_not_sent_idx'),
+        ]
+
     def __str__(self):
         return f"{self.name} (Extra of {self.main_guest.name})"
 
@@ -141,6 +195,17 @@ class WhatsAppBatch(models.Model):
     failed_count = models.PositiveIntegerField(default=0)
     finished_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        constraints = [
+            # Um envio em massa por vez; o índice parcial também atende a checagem no POST
+            models.UniqueConstraint(fields=['status'], condition=models.Q(status='running'), name='core_single_running_batch'),
+        ]
+
+    @property
+    def processed_count(self):
+        """Itens com resultado gravado; é o cursor do progresso incremental."""
+        return self.sent_count + self.failed_count
+
     def mark_completed(self):
         self.status = 'completed'
         self.finished_at = timezone.now()
@@ -165,11 +230,121 @@ class WhatsAppBatchItem(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     error_message = models.TextField(blank=True, default='')
     sent_at = models.DateTimeField(null=True, blank=True)
+    # Ordem em que o resultado foi gravado no batch (1..total); o progresso
+    # incremental pede "itens com seq > cursor"
+    seq = models.PositiveIntegerField(null=True, blank=True)
 
     class Meta:
         ordering = ['id']
+        indexes = [
+            models.Index(fields=['batch', 'status']),
+            models.Index(fields=['batch', 'seq'], name='core_batch_item_seq_idx'),
+        ]
 
     def __str__(self):
         return f"{self.guest_name} ({self.phone_number}) - {self.status}"
 
 
+
+
+class StatCounter(models.Model):
+    """
+    Contadores agregados do painel (RSVP por dia e totais de presentes),
+    mantidos incrementalmente pelos signals em core/signals.py.
+    """
+
+    key = models.CharField(max_length=100, unique=True)
+    count = models.BigIntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Contador do Painel"
+        verbose_name_plural = "Contadores do Painel"
+
+    def __str__(self):
+        return f"{self.key}: {self.count} (R$ {self.total})"
+
+
+class MercadoPagoNotification(models.Model):
+    """
+    Caixa de entrada do webhook do Mercado Pago.
+
+    O webhook só grava a notificação crua e responde 200; a consulta ao
+    pagamento, a atualização do Pagamento e os avisos no WhatsApp são feitos
+    depois por core.webhooks.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('processing', 'Processando'),
+        ('done', 'Processada'),
+        ('failed', 'Falhou'),
+    ]
+
+    topic = models.CharField(max_length=50, blank=True, default='')
+    resource_id = models.CharField(max_length=255, blank=True, default='')
+    # sha1 de (topic, id, status no Mercado Pago), preenchido ao processar
+    event_key = models.CharField(max_length=40, blank=True, default='', db_index=True)
+    payload = JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id']),
+            models.Index(fields=['topic', 'resource_id'], name='core_mp_notification_res_idx'),
+        ]
+        constraints = [
+            # Uma cópia por recurso esperando na fila: entregas simultâneas
+            # (GET e POST) caem na mesma linha
+            models.UniqueConstraint(
+                fields=['topic', 'resource_id'], condition=models.Q(status='pending'),
+                name='core_mp_notification_one_pending',
+            ),
+        ]
+        verbose_name = "Notificação do Mercado Pago"
+        verbose_name_plural = "Notificações do Mercado Pago"
+
+    def __str__(self):
+        return f"{self.topic} {self.resource_id} ({self.status})"
+
+
+class AdminNotification(models.Model):
+    """
+    Caixa de saída dos avisos de presente para os admins (um registro por
+    admin e evento). Enviada em segundo plano por core.notifications; no modo
+    digest, vários eventos do mesmo admin viram uma única mensagem.
+    """
+
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('sending', 'Enviando'),
+        ('sent', 'Enviada'),
+        ('failed', 'Falhou'),
+    ]
+
+    recipient = models.CharField(max_length=50)
+    text = models.TextField()
+    pagamento = models.ForeignKey(Pagamento, null=True, blank=True, on_delete=models.SET_NULL, related_name='admin_notifications')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    claim_token = models.CharField(max_length=32, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['status', 'recipient'])]
+        verbose_name = "Aviso para admin"
+        verbose_name_plural = "Avisos para admins"
+
+    def __str__(self):
+        return f"{self.recipient} ({self.status})"
@@ -0,0 +1,130 @@
+"""
+Avisos de presente para os admins via WhatsApp.
+
+`notificar_present` só grava um AdminNotification por admin e acorda o
+worker; o envio acontece em segundo plano, então nem o redirect para o
+checkout nem o processamento do webhook esperam pelo WhatsApp. Com
+ADMIN_NOTIFICATION_DIGEST_MINUTES > 0, os avisos de cada admin ficam
+acumulando por esse tempo e saem em uma única mensagem.
+"""
+import logging
+import uuid
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from otp.services import send_whatsapp_message
+
+from .models import AdminNotification, Pagamento
+from .workers import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+# Envios "sending" há mais tempo que isso são considerados abandonados
+STALE_AFTER = timedelta(minutes=5)
+
+
+def admin_numbers():
+    admin_numbers = getattr(settings, 'WEDDING_ADMINS_WHATSAPP', '') or ''
+    return [n.strip() for n in admin_numbers.split(',') if n.strip()]
+
+
+def gift_text(pagamento: Pagamento):
+    # Build message with details
+    present_name = pagamento.presente.nome if pagamento.presente else 'Presente'
+    amount = f"R$ {pagamento.valor:.2f}" if pagamento.valor is not None else '-'
+    guest_name = pagamento.nome_pagador or (pagamento.guest.name if pagamento.guest else '-')
+    guest_phone = pagamento.guest.phone_number if pagamento.guest else '-'
+    guest_msg = pagamento.message or '-'
+    return (
+        f"Novo presente recebido (ou iniciado)!\nPresente: {present_name}\nValor: {amount}\nPor: {guest_name} ({guest_phone})\nMensagem: {guest_msg}"
+        f"\nStatus atual: {pagamento.status}"
+        f"\nCheque na conta do MercadoPago para confirmação"
+    )
+
+
+def digest_text(texts):
+    return f"{len(texts)} novos presentes:\n\n" + "\n\n---\n\n".join(texts)
+
+
+def notificar_present(pagamento: Pagamento):
+    """Enfileira o aviso do presente para cada admin."""
+    text = gift_text(pagamento)
+    AdminNotification.objects.bulk_create([
+        AdminNotification(recipient=phone, text=text, pagamento=pagamento)
+        for phone in admin_numbers()
+    ])
+    transaction.on_commit(kick_sender)
+
+
+def _claimable(now):
+    return Q(status='pending') | Q(status='sending', locked_at__lt=now - STALE_AFTER)
+
+
+def _claim(ids, now):
+    """Marca os avisos como 'sending' com um token próprio (outro processo pode estar enviando)."""
+    token = uuid.uuid4().hex
+    AdminNotification.objects.filter(
+        _claimable(now), id__in=ids,
+    ).update(status='sending', claim_token=token, locked_at=now)
+    return list(AdminNotification.objects.filter(claim_token=token).order_by('id'))
+
+
+def send_pending(digest_minutes=None):
+    """
+    Envia os avisos pendentes (um WhatsApp por admin). Retorna em quantos
+    segundos o próximo digest fica pronto, ou None se não sobrou nada agendado.
+    """
+    if digest_minutes is None:
+        digest_minutes = settings.ADMIN_NOTIFICATION_DIGEST_MINUTES
+    window = timedelta(minutes=digest_minutes)
+    now = timezone.now()
+    next_due = None
+
+    pending = AdminNotification.objects.filter(_claimable(now)).order_by('recipient', 'id')
+    rows = pending.values_list('recipient', 'id', 'created_at')
+    for recipient, group in groupby(rows, key=lambda row: row[0]):
+        group = list(group)
+        due = group[0][2] + window
+        if due > now:
+            wait = (due - now).total_seconds()
+            next_due = wait if next_due is None else min(next_due, wait)
+            continue
+
+        notifications = _claim([row[1] for row in group], now)
+        if not notifications:
+            continue
+        texts = [n.text for n in notifications]
+        text = texts[0] if len(texts) == 1 else digest_text(texts)
+        try:
+            success, error = send_whatsapp_message(recipient, text)
+        except Exception as exc:
+            success, error = False, str(exc)
+
+        ids = [n.id for n in notifications]
+        if success:
+            AdminNotification.objects.filter(id__in=ids).update(status='sent', sent_at=timezone.now(), claim_token='')
+            continue
+
+        logger.warning("Failed to notify admin %s via WhatsApp: %s", recipient, error)
+        for n in notifications:
+            n.attempts += 1
+            n.last_error = (error or 'Erro desconhecido')[:2000]
+            n.status = 'failed' if n.attempts >= MAX_ATTEMPTS else 'pending'
+            n.claim_token = ''
+        AdminNotification.objects.bulk_update(notifications, ['attempts', 'last_error', 'status', 'claim_token'])
+
+    return next_due
+
+
+_worker = BackgroundWorker('admin-notifications', send_pending)
+
+
+def kick_sender():
+    _worker.kick()
@@ -0,0 +1,177 @@
+"""
+Serviço de pagamentos do Mercado Pago.
+
+Um único SDK por processo (recriado só se o token mudar), com uma sessão
+HTTP persistente (keep-alive + pool de conexões) em vez de uma sessão nova a
+cada chamada, timeout explícito e log de latência por requisição. Todas as
+preferências de checkout são montadas por `build_preference`, e
+`start_checkout` reaproveita o checkout ainda pendente quando o mesmo
+convidado clica de novo no mesmo presente.
+"""
+import hashlib
+import logging
+import threading
+import time
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+import mercadopago
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from mercadopago.config import RequestOptions
+from mercadopago.http import HttpClient
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from . import metrics, profiling
+from .models import Pagamento
+
+logger = logging.getLogger(__name__)
+
+# Chamadas mais lentas que isso geram um warning no log
+SLOW_CALL_SECONDS = 2.0
+
+# Por quanto tempo o mesmo convidado reaproveita o checkout do mesmo presente
+PREFERENCE_REUSE_TTL = 30 * 60
+
+
+class PaymentError(Exception):
+    """Falha ao criar a preferência; a mensagem pode ser mostrada ao convidado."""
+
+
+class PooledHttpClient(HttpClient):
+    """HttpClient do SDK reaproveitando uma requests.Session entre chamadas."""
+
+    def __init__(self, max_retries=3, pool_size=10):
+        self.session = requests.Session()
+        self.session.hooks = profiling.http_hooks()
+        retry_strategy = Retry(total=max_retries, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        started = time.monotonic()
+        status = None
+        try:
+            api_result = self.session.request(method, url, **kwargs)
+            status = api_result.status_code
+            response = {"status": status, "response": None}
+            if status != 204 and api_result.content:
+                try:
+                    response["response"] = api_result.json()
+                except ValueError:
+                    logger.warning("Resposta do Mercado Pago não é JSON: %s %s", method, url)
+            return response
+        finally:
+            elapsed = time.monotonic() - started
+            path = urlsplit(url).path
+            metrics.MERCADOPAGO_REQUEST_SECONDS.observe(
+                elapsed, method=method, endpoint=metrics.endpoint_label(path), status=status or 'error',
+            )
+            level = logging.WARNING if elapsed >= SLOW_CALL_SECONDS else logging.DEBUG
+            logger.log(level, "Mercado Pago %s %s -> %s em %.0fms", method, path, status, elapsed * 1000)
+
+
+_sdk_lock = threading.Lock()
+_sdk = None
+_sdk_token = None
+
+
+def get_sdk():
+    """Obter SDK do Mercado Pago com token carregado (compartilhado no processo)"""
+    global _sdk, _sdk_token
+    token = settings.MERCADO_PAGO_ACCESS_TOKEN
+    if not token:
+        raise ValueError("MERCADO_PAGO_ACCESS_TOKEN não está configurado")
+    with _sdk_lock:
+        if _sdk is None or _sdk_token != token:
+            options = RequestOptions(connection_timeout=float(settings.MERCADO_PAGO_TIMEOUT))
+            _sdk = mercadopago.SDK(token, http_client=PooledHttpClient(), request_options=options)
+            _sdk_token = token
+        return _sdk
+
+
+def build_preference(pagamento, title, unit_price):
+    """Dados da preferência de checkout para um Pagamento já salvo."""
+    return {
+        "items": [
+            {
+                "title": title,
+                "quantity": 1,
+                "currency_id": "BRL",
+                "unit_price": float(unit_price),
+            }
+        ],
+        "external_reference": str(pagamento.id),
+        "back_urls": {
+            "success": f"{settings.SITE_URL}/pagamento/sucesso/",
+            "failure": f"{settings.SITE_URL}/pagamento/erro/",
+            "pending": f"{settings.SITE_URL}/pagamento/pendente/",
+        },
+        "notification_url": f"{settings.SITE_URL}/webhook/mercadopago/",
+    }
+
+
+def create_checkout(pagamento, title, unit_price):
+    """Cria a preferência no Mercado Pago e retorna a URL de checkout (init_point)."""
+    preference = get_sdk().preference().create(build_preference(pagamento, title, unit_price))
+    response = preference.get("response") or {}
+    if preference.get("status") != 201:
+        raise PaymentError(response.get("message", "Erro ao criar preferência"))
+    init_point = response.get("init_point")
+    if not init_point:
+        raise PaymentError("Checkout URL não retornada pelo Mercado Pago")
+    return init_point
+
+
+def checkout_cache_key(guest_id, presente_id, valor, message):
+    valor = Decimal(str(valor)).quantize(Decimal('0.01'))
+    message_hash = hashlib.sha1((message or '').encode('utf-8')).hexdigest()[:16]
+    target = f"presente:{presente_id}" if presente_id else f"valor:{valor}"
+    return f"mp:checkout:{guest_id}:{target}:{message_hash}"
+
+
+def _reusable(cached):
+    """Pagamento do cache, se ele ainda estiver esperando pagamento."""
+    return Pagamento.objects.filter(
+        id=cached['pagamento_id'], status='pendente', mp_payment_id__isnull=True,
+    ).select_related('presente', 'guest').first()
+
+
+def start_checkout(title, valor, presente=None, guest=None, message=None):
+    """
+    Cria (ou reaproveita) o Pagamento pendente e o checkout do Mercado Pago.
+
+    Se o mesmo convidado pedir o mesmo presente (ou valor) com a mesma
+    mensagem dentro de PREFERENCE_REUSE_TTL, devolve o Pagamento e o
+    init_point anteriores em vez de criar outra linha e outra preferência.
+    Retorna (pagamento, init_point, criado).
+    """
+    cache_key = None
+    if guest is not None:
+        cache_key = checkout_cache_key(guest.id, presente.id if presente else None, valor, message)
+        cached = cache.get(cache_key)
+        if cached:
+            pagamento = _reusable(cached)
+            if pagamento is not None:
+                return pagamento, cached['init_point'], False
+            cache.delete(cache_key)
+
+    pagamento = Pagamento.objects.create(
+        presente=presente,
+        valor=valor,
+        guest=guest,
+        nome_pagador=guest.name if guest else None,
+        message=message or None,
+    )
+    try:
+        init_point = create_checkout(pagamento, title, valor)
+    except Exception:
+        # Sem checkout não há o que pagar: não deixa a linha órfã no painel
+        pagamento.delete()
+        raise
+
+    if cache_key:
+        cache.set(cache_key, {'pagamento_id': pagamento.id, 'init_point': init_point}, PREFERENCE_REUSE_TTL)
+    return pagamento, init_point, True
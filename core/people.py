@@ -0,0 +1,73 @@
+"""
+Convidados principais e extras como uma lista só de "pessoas".
+
+`people()` é um UNION ALL de Guest e ExtraGuest com as mesmas colunas e um
+discriminador: cada linha é um dict com kind ('guest' ou 'extra'), id, name,
+phone_number, jid, day1_status, day2_status, message_sent, group_id (o id do
+convidado principal do grupo) e identifier ('guest-12', 'extra-7'), o valor
+usado nos checkboxes do envio em massa. Ordenação, contagem e fatiamento
+(Paginator) rodam numa consulta só.
+"""
+from django.db.models import CharField, F, Q, Value
+from django.db.models.functions import Cast, Concat
+
+from .models import ExtraGuest, Guest
+
+GUEST, EXTRA = 'guest', 'extra'
+
+FIELDS = ('id', 'name', 'phone_number', 'jid', 'day1_status', 'day2_status', 'message_sent')
+# Mesma ordem de annotate nos dois lados, para as colunas do UNION baterem
+ANNOTATIONS = ('kind', 'group_id', 'identifier')
+
+
+def _as_people(queryset, kind, group):
+    return queryset.annotate(
+        kind=Value(kind, output_field=CharField()),
+        group_id=F(group),
+        identifier=Concat(Value(f"{kind}-"), Cast('id', CharField()), output_field=CharField()),
+    ).values(*FIELDS, *ANNOTATIONS).order_by()
+
+
+def parse_identifiers(identifiers):
+    """{'guest': {ids}, 'extra': {ids}} a partir de 'guest-12'/'extra-7'; ignora o que não bate."""
+    ids = {GUEST: set(), EXTRA: set()}
+    for identifier in identifiers:
+        kind, _, pk = identifier.partition('-')
+        if kind in ids and pk.isdigit():
+            ids[kind].add(int(pk))
+    return ids
+
+
+def people(q=None, narrow=None, only=None, exclude=None):
+    """
+    Pessoas que atendem `q` (um Q sobre as colunas comuns). `narrow(queryset)`
+    é aplicado aos dois lados antes do UNION (ex.: filter_by_rsvp), já que o
+    Django não filtra um UNION depois de montado. `only` e `exclude` são
+    identifiers ('guest-12', 'extra-7') para restringir ou tirar pessoas.
+    """
+    sides = {GUEST: Guest.objects.all(), EXTRA: ExtraGuest.objects.all()}
+    only = parse_identifiers(only) if only is not None else None
+    exclude = parse_identifiers(exclude or ())
+    for kind, queryset in sides.items():
+        if q is not None:
+            queryset = queryset.filter(q)
+        if only is not None:
+            queryset = queryset.filter(id__in=only[kind])
+        if exclude[kind]:
+            queryset = queryset.exclude(id__in=exclude[kind])
+        if narrow is not None:
+            queryset = narrow(queryset)
+        sides[kind] = queryset
+    return _as_people(sides[GUEST], GUEST, 'id').union(_as_people(sides[EXTRA], EXTRA, 'main_guest_id'), all=True)
+
+
+def find_by_phone(candidates):
+    """
+    Pessoa com um dos telefones, preferindo o convidado principal e depois a
+    ordem de `candidates`. Retorna o dict da pessoa ou None.
+    """
+    candidates = list(candidates)
+    matches = list(people(Q(phone_number__in=candidates)))
+    if not matches:
+        return None
+    return min(matches, key=lambda p: (p['kind'] != GUEST, candidates.index(p['phone_number'])))
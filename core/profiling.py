@@ -0,0 +1,135 @@
+"""
+Perfil por requisição: consultas SQL, tempo de banco, de templates e de
+chamadas HTTP externas.
+
+O ProfilingMiddleware (core.middleware) abre um RequestProfile em um
+contextvar; os ganchos abaixo somam nele:
+
+- `connection.execute_wrapper(profile.execute)` para o SQL;
+- o backend de templates `core.profiling.DjangoTemplates` para a renderização;
+- `http_hooks()` nas sessões HTTP compartilhadas (Mercado Pago, WhatsApp) e
+  `outbound()` nas chamadas que não usam requests (Gemini).
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.template.backends.django import DjangoTemplates as _DjangoTemplates
+from django.template.backends.django import Template as _Template
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self, keep_queries=False):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.http_time = 0.0
+        self.http_calls = 0
+        # Só guardamos o SQL no modo ?_profile=1
+        self.keep_queries = keep_queries
+        self.sql = []
+        self._template_depth = 0
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            if self.keep_queries:
+                self.sql.append((sql, elapsed))
+
+    def add_http(self, elapsed):
+        self.http_calls += 1
+        self.http_time += elapsed
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            'duration_ms': round(self.elapsed * 1000, 1),
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'http_ms': round(self.http_time * 1000, 1),
+            'http_calls': self.http_calls,
+        }
+
+
+def current():
+    return _current.get()
+
+
+@contextmanager
+def activate(profile):
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+# ----------------------------------------------------------------------
+# HTTP externo
+# ----------------------------------------------------------------------
+
+def _response_hook(response, *args, **kwargs):
+    profile = _current.get()
+    if profile is not None:
+        profile.add_http(response.elapsed.total_seconds())
+
+
+def http_hooks():
+    """Hooks para `requests.Session.hooks`."""
+    return {'response': [_response_hook]}
+
+
+@contextmanager
+def outbound():
+    """Conta como HTTP externo um bloco que não passa por uma sessão requests."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile = _current.get()
+        if profile is not None:
+            profile.add_http(time.perf_counter() - started)
+
+
+# ----------------------------------------------------------------------
+# Templates
+# ----------------------------------------------------------------------
+
+class Template(_Template):
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return super().render(context, request)
+        # {% include %} não passa por aqui, mas render_to_string dentro de
+        # uma view renderizando outro template passaria: só mede o de fora.
+        profile._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile._template_depth -= 1
+            if profile._template_depth == 0:
+                profile.template_time += time.perf_counter() - started
+
+
+class DjangoTemplates(_DjangoTemplates):
+    """Backend de templates do Django que mede o tempo de renderização."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return Template(template.template, self)
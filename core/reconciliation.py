@@ -0,0 +1,140 @@
+"""
+Reconciliação de pagamentos que ficaram "pendente" porque o webhook se perdeu.
+
+Em vez de uma busca por Pagamento, lista no Mercado Pago
+(/v1/payments/search) os pagamentos criados desde o Pagamento pendente mais
+antigo, em páginas (as seguintes à primeira buscadas em paralelo), e casa
+o external_reference localmente. O resultado é aplicado pelo mesmo caminho
+do webhook (`webhooks.apply_payment_info`), na thread principal.
+"""
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.utils import timezone
+
+from . import webhooks
+from .models import Pagamento
+from .payments import get_sdk
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STALE_AFTER = timedelta(minutes=30)
+DEFAULT_MAX_AGE = timedelta(days=30)
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_CONCURRENCY = 4
+
+# A tentativa de pagamento é criada depois do Pagamento; a folga cobre
+# diferença de relógio com o Mercado Pago
+SEARCH_MARGIN = timedelta(minutes=5)
+
+# Ordem de preferência quando há mais de uma tentativa de pagamento na mesma referência
+_STATUS_PRIORITY = {'aprovado': 0, 'pendente': 1, 'recusado': 2, 'cancelado': 2}
+
+
+@dataclass
+class ReconcileResult:
+    checked: int = 0
+    updated: int = 0
+    approved: int = 0
+    not_found: int = 0
+    pages: int = 0
+
+
+def stale_pending(stale_after=DEFAULT_STALE_AFTER, max_age=DEFAULT_MAX_AGE):
+    """Pagamentos pendentes criados entre `max_age` e `stale_after` atrás."""
+    now = timezone.now()
+    return Pagamento.objects.filter(
+        status='pendente',
+        criado_em__lt=now - stale_after,
+        criado_em__gte=now - max_age,
+    ).order_by('criado_em')
+
+
+def search_page(sdk, begin, end, offset, page_size):
+    """Uma página dos pagamentos criados entre begin e end. Retorna (results, total)."""
+    result = sdk.payment().search(filters={
+        'range': 'date_created',
+        'begin_date': begin.isoformat(),
+        'end_date': end.isoformat(),
+        'sort': 'date_created',
+        'criteria': 'asc',
+        'offset': offset,
+        'limit': page_size,
+    })
+    if result.get('status') != 200:
+        raise RuntimeError(f"Mercado Pago respondeu {result.get('status')}")
+    response = result.get('response') or {}
+    results = response.get('results') or []
+    total = (response.get('paging') or {}).get('total', offset + len(results))
+    return results, total
+
+
+def search_window(sdk, begin, end, page_size=DEFAULT_PAGE_SIZE, concurrency=DEFAULT_CONCURRENCY):
+    """
+    Todos os pagamentos criados entre begin e end: a primeira página diz o
+    total e as demais são buscadas em paralelo. Retorna (results, páginas).
+    """
+    results, total = search_page(sdk, begin, end, 0, page_size)
+    offsets = range(page_size, total, page_size)
+    if offsets:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for page, _ in pool.map(lambda offset: search_page(sdk, begin, end, offset, page_size), offsets):
+                results.extend(page)
+    return results, 1 + len(offsets)
+
+
+def pick_payment(results):
+    """A tentativa que define o status: aprovada, senão a mais recente."""
+    if not results:
+        return None
+    # `sorted` é estável: empates mantêm a ordem (mais recente primeiro)
+    return sorted(
+        results,
+        key=lambda info: _STATUS_PRIORITY.get(webhooks.STATUS_MAP.get(info.get('status'), 'pendente'), 1),
+    )[0]
+
+
+def reconcile(pagamentos, sdk=None, page_size=DEFAULT_PAGE_SIZE, concurrency=DEFAULT_CONCURRENCY, dry_run=False):
+    """
+    Consulta e atualiza os Pagamentos informados. Retorna um ReconcileResult;
+    uma falha na busca (RuntimeError) interrompe sem alterar nada.
+    """
+    result = ReconcileResult()
+    rows = list(pagamentos.values_list('id', 'criado_em'))
+    if not rows:
+        return result
+    sdk = sdk or get_sdk()
+    oldest = min(criado_em for _, criado_em in rows)
+
+    payments, result.pages = search_window(
+        sdk, oldest - SEARCH_MARGIN, timezone.now(), page_size=page_size, concurrency=concurrency,
+    )
+    logger.info("Reconciliação: %s pagamentos no Mercado Pago (%s páginas) para %s pendentes",
+                len(payments), result.pages, len(rows))
+    # Pode haver várias tentativas por Pagamento (cartão recusado, depois Pix...)
+    by_reference = defaultdict(list)
+    for info in payments:
+        by_reference[str(info.get('external_reference'))].append(info)
+
+    for pagamento_id, _ in rows:
+        result.checked += 1
+        # pick_payment prefere a mais recente nos empates
+        info = pick_payment(list(reversed(by_reference.get(str(pagamento_id), []))))
+        if info is None:
+            result.not_found += 1
+            continue
+        # Todos os selecionados estavam pendentes
+        if webhooks.STATUS_MAP.get(info.get('status'), 'pendente') != 'pendente':
+            result.updated += 1
+        if dry_run:
+            continue
+
+        pagamento, just_approved = webhooks.apply_payment_info(info.get('id'), info)
+        if just_approved:
+            result.approved += 1
+            webhooks.notify_approved(pagamento)
+
+    return result
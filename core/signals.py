@@ -0,0 +1,119 @@
+"""
+Mantém core.stats.StatCounter em dia a cada save/delete (e, no fim, o cache
+de autenticação dos convidados usado pelos decorators).
+
+Cada instância guarda um snapshot dos campos relevantes ao ser carregada
+(post_init); no post_save/post_delete aplicamos só a diferença entre o
+snapshot e o estado novo, sem recontar as tabelas.
+"""
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_init, post_save
+
+from . import stats
+from .decorators import cache_guest_auth, forget_guest_auth
+from .models import ExtraGuest, Guest, Pagamento
+
+
+def _person_snapshot(person):
+    return (person.day1_status, person.day2_status)
+
+
+def _pagamento_snapshot(pagamento):
+    # valor pode chegar como float (ex.: contribuição personalizada do assistente)
+    valor = Decimal(str(pagamento.valor or 0)).quantize(Decimal('0.01'))
+    return (pagamento.status, pagamento.presente_id, valor)
+
+
+def _person_deltas(deltas, snapshot, sign):
+    for day, status in zip(stats.DAYS, snapshot):
+        stats.add_delta(deltas, stats.rsvp_key(day, status), sign)
+
+
+def _pagamento_deltas(deltas, snapshot, sign):
+    status, presente_id, valor = snapshot
+    for key in stats.gift_keys(status, presente_id):
+        stats.add_delta(deltas, key, sign, sign * valor)
+
+
+PERSON_FIELDS = frozenset({'day1_status', 'day2_status'})
+
+# Modelo -> (campos lidos pelo snapshot, snapshot, deltas)
+SNAPSHOTS = {
+    Guest: (PERSON_FIELDS, _person_snapshot, _person_deltas),
+    ExtraGuest: (PERSON_FIELDS, _person_snapshot, _person_deltas),
+    # 'presente' e 'presente_id': update_fields aceita os dois nomes
+    Pagamento: (frozenset({'status', 'presente', 'presente_id', 'valor'}), _pagamento_snapshot, _pagamento_deltas),
+}
+
+# Carregada com .only()/.defer() sem algum campo do snapshot: ler o campo
+# aqui faria um refresh_from_db, cuja instância (também parcial) dispararia
+# outro post_init, e assim por diante
+UNKNOWN = object()
+
+
+def _current_snapshot(sender, instance):
+    fields, snapshot, _ = SNAPSHOTS[sender]
+    if fields & instance.get_deferred_fields():
+        return UNKNOWN
+    return snapshot(instance)
+
+
+def _take_snapshot(sender, instance, **kwargs):
+    # Instâncias novas (sem pk) ainda não contam nos totais
+    instance._stats_snapshot = _current_snapshot(sender, instance) if instance.pk else None
+
+
+def _on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    fields, _, to_deltas = SNAPSHOTS[sender]
+    previous = getattr(instance, '_stats_snapshot', None)
+    if previous is UNKNOWN:
+        if update_fields is None or fields & set(update_fields):
+            # O valor anterior não foi lido: recalcula tudo na próxima leitura,
+            # como depois de um .update() em massa
+            stats.invalidate_stats()
+        instance._stats_snapshot = _current_snapshot(sender, instance)
+        return
+    deltas = {}
+    if previous is not None:
+        to_deltas(deltas, previous, -1)
+    current = _current_snapshot(sender, instance)
+    to_deltas(deltas, current, +1)
+    stats.apply_deltas(deltas)
+    instance._stats_snapshot = current
+
+
+def _on_delete(sender, instance, **kwargs):
+    _, snapshot, to_deltas = SNAPSHOTS[sender]
+    previous = getattr(instance, '_stats_snapshot', None)
+    if previous is UNKNOWN:
+        # A linha já foi apagada; não dá mais para ler o que ela contava
+        stats.invalidate_stats()
+        instance._stats_snapshot = None
+        return
+    previous = previous or snapshot(instance)
+    deltas = {}
+    to_deltas(deltas, previous, -1)
+    stats.apply_deltas(deltas)
+    instance._stats_snapshot = None
+
+
+for _model in SNAPSHOTS:
+    post_init.connect(_take_snapshot, sender=_model, dispatch_uid=f'stats_init_{_model.__name__}')
+    post_save.connect(_on_save, sender=_model, dispatch_uid=f'stats_save_{_model.__name__}')
+    post_delete.connect(_on_delete, sender=_model, dispatch_uid=f'stats_delete_{_model.__name__}')
+
+
+def _refresh_guest_auth(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache_guest_auth(instance)
+
+
+def _forget_guest_auth(sender, instance, **kwargs):
+    forget_guest_auth(instance.pk)
+
+
+post_save.connect(_refresh_guest_auth, sender=Guest, dispatch_uid='guest_auth_save')
+post_delete.connect(_forget_guest_auth, sender=Guest, dispatch_uid='guest_auth_delete')
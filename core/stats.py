@@ -0,0 +1,165 @@
+"""
+Estatísticas agregadas do painel de administração.
+
+Os números (confirmações por dia, somas de presentes por status) ficam
+pré-calculados na tabela StatCounter. Os signals em core/signals.py aplicam
+deltas a cada save/delete de Guest, ExtraGuest e Pagamento, então o cabeçalho
+do painel é uma única consulta pequena. `rebuild_stats()` recalcula tudo do
+zero com consultas agregadas (usado na primeira leitura ou após `.update()`
+em massa, que não dispara signals).
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import DAY_STATUS_CHOICES, ExtraGuest, Guest, Pagamento, StatCounter
+
+DAYS = (1, 2)
+DAY_LABELS = {1: '10/out', 2: '11/out'}
+
+# Marca que a tabela já foi populada ao menos uma vez
+BUILT_KEY = 'meta:built'
+
+
+def rsvp_key(day, status):
+    return f"rsvp:day{day}:{status}"
+
+
+def gift_key(status, presente_id=None, custom=False):
+    if custom:
+        return f"gift:{status}:custom"
+    if presente_id is not None:
+        return f"gift:{status}:presente:{presente_id}"
+    return f"gift:{status}"
+
+
+def gift_keys(status, presente_id):
+    """Chaves afetadas por um pagamento: total do status e total do presente."""
+    return [gift_key(status), gift_key(status, presente_id, custom=presente_id is None)]
+
+
+# ----------------------------------------------------------------------
+# Atualização incremental
+# ----------------------------------------------------------------------
+
+def apply_deltas(deltas):
+    """Aplica {key: (delta_count, delta_total)} com UPDATE ... SET count = count + N."""
+    for key, (d_count, d_total) in deltas.items():
+        if not d_count and not d_total:
+            continue
+        updated = StatCounter.objects.filter(key=key).update(
+            count=F('count') + d_count,
+            total=F('total') + d_total,
+        )
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                StatCounter.objects.create(key=key, count=d_count, total=d_total)
+        except IntegrityError:
+            # Outro processo criou a linha entre o UPDATE e o INSERT
+            StatCounter.objects.filter(key=key).update(
+                count=F('count') + d_count,
+                total=F('total') + d_total,
+            )
+
+
+def add_delta(deltas, key, count, total=Decimal('0')):
+    d_count, d_total = deltas.get(key, (0, Decimal('0')))
+    deltas[key] = (d_count + count, d_total + total)
+
+
+# ----------------------------------------------------------------------
+# Recalculo completo
+# ----------------------------------------------------------------------
+
+def _rsvp_aggregates(model):
+    aliases = {}
+    for day in DAYS:
+        for status, _ in DAY_STATUS_CHOICES:
+            aliases[f"day{day}_{status}"] = Count('id', filter=Q(**{f"day{day}_status": status}))
+    result = model.objects.aggregate(**aliases)
+    return {
+        rsvp_key(day, status): result[f"day{day}_{status}"] or 0
+        for day in DAYS
+        for status, _ in DAY_STATUS_CHOICES
+    }
+
+
+def compute_stats():
+    """Calcula todos os contadores com consultas agregadas (sem iterar linhas)."""
+    counters = {}
+
+    # Uma consulta por tabela de pessoas
+    for model in (Guest, ExtraGuest):
+        for key, value in _rsvp_aggregates(model).items():
+            add_delta(counters, key, value)
+
+    # Uma consulta agrupada por (presente, status)
+    rows = Pagamento.objects.values('presente_id', 'status').annotate(n=Count('id'), soma=Sum('valor'))
+    for row in rows:
+        for key in gift_keys(row['status'], row['presente_id']):
+            add_delta(counters, key, row['n'], row['soma'] or Decimal('0'))
+
+    return counters
+
+
+@transaction.atomic
+def rebuild_stats():
+    counters = compute_stats()
+    StatCounter.objects.all().delete()
+    StatCounter.objects.bulk_create(
+        [StatCounter(key=key, count=count, total=total) for key, (count, total) in counters.items()]
+        + [StatCounter(key=BUILT_KEY, count=1)]
+    )
+    return counters
+
+
+def invalidate_stats():
+    """Faz a próxima leitura do painel recalcular tudo (rebuild_stats)."""
+    StatCounter.objects.filter(key=BUILT_KEY).delete()
+
+
+# ----------------------------------------------------------------------
+# Leitura para o painel
+# ----------------------------------------------------------------------
+
+def get_dashboard_stats():
+    """Lê os contadores (uma consulta) e monta a estrutura usada no template."""
+    counters = {c.key: c for c in StatCounter.objects.all()}
+    if BUILT_KEY not in counters:
+        rebuild_stats()
+        counters = {c.key: c for c in StatCounter.objects.all()}
+
+    def count(key):
+        return counters[key].count if key in counters else 0
+
+    def total(key):
+        return counters[key].total if key in counters else Decimal('0')
+
+    days = []
+    for day in DAYS:
+        entry = {'label': DAY_LABELS[day]}
+        for status, _ in DAY_STATUS_CHOICES:
+            entry[status] = count(rsvp_key(day, status))
+        days.append(entry)
+
+    gifts = {
+        status: {'count': count(gift_key(status)), 'total': total(gift_key(status))}
+        for status, _ in Pagamento.STATUS_CHOICES
+    }
+
+    by_presente = {}
+    prefix = 'gift:aprovado:presente:'
+    for key, counter in counters.items():
+        if key.startswith(prefix):
+            by_presente[int(key[len(prefix):])] = {'count': counter.count, 'total': counter.total}
+
+    return {
+        'days': days,
+        'gifts': gifts,
+        'approved_by_presente': by_presente,
+        'custom_approved': {'count': count(gift_key('aprovado', custom=True)),
+                            'total': total(gift_key('aprovado', custom=True))},
+    }
@@ -0,0 +1,81 @@
+import gzip
+import logging
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+
+def minify_css(text):
+    """Minificação simples de CSS: remove comentários e espaços redundantes."""
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """
+    Minificação conservadora de JS: só remove indentação, linhas vazias e
+    comentários de linha inteira (não mexe em strings/URLs com //).
+    """
+    lines = (line.strip() for line in text.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Storage do collectstatic com CSS/JS minificados, nomes versionados por hash
+    (staticfiles.json) e cópias pré-comprimidas `.gz` para que o Nginx sirva
+    direto do disco (gzip_static) com cache "immutable".
+    """
+
+    minifiers = {'.css': minify_css, '.js': minify_js}
+    compress_extensions = ('.css', '.js', '.svg')
+    # Arquivos muito pequenos não compensam a compressão.
+    compress_min_size = 256
+
+    # Sem collectstatic (dev/testes) usamos o nome original em vez de falhar.
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            logger.warning("Static file %s não foi coletado; servindo sem hash.", name)
+            # Memoriza o fallback para não repetir o aviso (e o stat) a cada request.
+            self.hashed_files[self.hash_key(self.clean_name(name))] = name
+            return name
+
+    def _save(self, name, content):
+        minify = next((f for ext, f in self.minifiers.items() if name.endswith(ext)), None)
+        if minify and '.min.' not in name:
+            content.seek(0)
+            text = content.read()
+            if isinstance(text, bytes):
+                text = text.decode('utf-8')
+            content = ContentFile(minify(text).encode('utf-8'))
+        return super()._save(name, content)
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(paths, dry_run=dry_run, **options):
+            if not dry_run and hashed_name and not isinstance(processed, Exception):
+                self._compress(name)
+                self._compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def _compress(self, name):
+        if not name.lower().endswith(self.compress_extensions):
+            return
+        path = self.path(name)
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < self.compress_min_size:
+            return
+
+        # mtime=0 deixa o .gz determinístico entre deploys.
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
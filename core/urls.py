@@ -29,6 +29,7 @@ urlpatterns = [
     path('pagamento/erro/', views.pagamento_erro, name='pagamento_erro'),
     path('pagamento/pendente/', views.pagamento_pendente, name='pagamento_pendente'),
     path('webhook/mercadopago/', views.webhook_mercadopago, name='webhook_mercadopago'),
+    path('metrics', views.prometheus_metrics, name='metrics'),
     path("otp/", include("otp.urls")),
     path('confirmacao/', views.confirmacao_familia, name='confirmacao_familia'),
     path('admin/', admin.site.urls),
@@ -50,9 +51,13 @@ urlpatterns = [
     path('wedding-admin/guest/<int:main_guest_id>/extra/add/', views.admin_add_extra_guest, name='admin_add_extra_guest'),
     path('wedding-admin/extra/<int:pk>/edit/', views.admin_edit_extra_guest, name='admin_edit_extra_guest'),
     path('wedding-admin/extra/<int:pk>/delete/', views.admin_delete_extra_guest, name='admin_delete_extra_guest'),
+    path("wedding-admin/export/convidados/", views.export_guests, name="export_guests"),
+    path("wedding-admin/export/pagamentos/", views.export_pagamentos, name="export_pagamentos"),
     path("wedding-admin/send-whatsapp/", views.send_whatsapp_mass, name="send_whatsapp_mass"),
+    path("wedding-admin/send-whatsapp/recipients/", views.send_whatsapp_recipients, name="send_whatsapp_recipients"),
     path("wedding-admin/whatsapp-batch/<int:batch_id>/", views.whatsapp_batch_status, name="whatsapp_batch_status"),
     path("wedding-admin/whatsapp-batch/<int:batch_id>/json/", views.whatsapp_batch_status_json, name="whatsapp_batch_status_json"),
+    path("wedding-admin/whatsapp-batch/<int:batch_id>/events/", views.whatsapp_batch_events, name="whatsapp_batch_events"),
 ]
 
 if settings.DEBUG:
@@ -1,18 +1,18 @@
+import json
 import logging
-import mercadopago
 import threading
 import time
 from django.core.files.base import ContentFile
-from django.db import close_old_connections
+from django.db import IntegrityError, close_old_connections, connections, transaction
 from django.utils import timezone
 from assistant.ai import whatsapp_gemini_api
 from otp.services import send_whatsapp_message
 
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.conf import settings
-from django.db.models import Q
-from core.mercadopago_sdk import get_sdk
+from django.core.paginator import Paginator
+from django.db.models import Prefetch, Q
 from django.views.decorators.http import require_http_methods, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
@@ -21,17 +21,12 @@ from django.urls import reverse
 from .forms import WhatsAppMessageForm, PresenteForm, PagamentoForm, GuestForm, ExtraGuestForm, SiteContentForm
 from .models import Presente, Pagamento, Guest, ExtraGuest, SiteContent
 from .decorators import guest_required, wedding_admin_required
+from .stats import get_dashboard_stats
+from . import dbwrites, exports, metrics, payments, people, webhooks
+from .notifications import notificar_present
 from .models import WhatsAppBatch, WhatsAppBatchItem
 
 
-def get_sdk():
-    """Obter SDK do Mercado Pago com token carregado"""
-    token = settings.MERCADO_PAGO_ACCESS_TOKEN
-    if not token:
-        raise ValueError("MERCADO_PAGO_ACCESS_TOKEN não está configurado")
-    return mercadopago.SDK(token)
-
-
 @guest_required
 def home(request):
     from .models import ExtraGuest
@@ -58,9 +53,6 @@ def home(request):
         def _save_rsvp_person(person, day, action, person_name):
             status_field = f"day{day}_status"
             setattr(person, status_field, 'confirmed' if action == 'confirmed' else 'rejected')
-            person.is_confirmed = person.day1_status == 'confirmed' and person.day2_status == 'confirmed'
-            person.is_rejected = person.day1_status == 'rejected' and person.day2_status == 'rejected'
-            person.not_answered = person.day1_status == 'pending' and person.day2_status == 'pending'
             person.save()
             return f"Presença de {person_name} no dia {day} {'confirmada' if action == 'confirmed' else 'rejeitada'}!"
 
@@ -152,35 +144,46 @@ def presente(request):
     """Redirect to presents section on single home page."""
     return redirect(reverse('home') + '#presentes')
 
-def notificar_present(pagamento: Pagamento):
-    admin_numbers = getattr(settings, 'WEDDING_ADMINS_WHATSAPP', '') or ''
-    admin_list = [n.strip() for n in admin_numbers.split(',') if n.strip()]
-    # Build message with details
-    present_name = pagamento.presente.nome if pagamento.presente else 'Presente'
-    amount = f"R$ {pagamento.valor:.2f}" if pagamento.valor is not None else '-' 
-    guest_name = pagamento.nome_pagador or (pagamento.guest.name if pagamento.guest else '-')
-    guest_phone = pagamento.guest.phone_number if pagamento.guest else '-'
-    guest_msg = pagamento.message or '-'
-    text = (
-        f"Novo presente recebido (ou iniciado)!\nPresente: {present_name}\nValor: {amount}\nPor: {guest_name} ({guest_phone})\nMensagem: {guest_msg}"
-        f"\nStatus atual: {pagamento.status}"
-        f"\nCheque na conta do MercadoPago para confirmação"
-    )
-    for admin_phone in admin_list:
-        try:
-            success, error = send_whatsapp_message(admin_phone, text)
-            if not success:
-                logger = logging.getLogger(__name__)
-                logger.warning("Failed to notify admin %s via WhatsApp: %s", admin_phone, error)
-        except Exception:
-            # swallow errors to keep webhook resilient
-            pass
-
 logger = logging.getLogger(__name__)
 
 
 WHATSAPP_SEND_DELAY_SECONDS = getattr(settings, 'WHATSAPP_SEND_DELAY_SECONDS', 1.0)
 
+# Acorda os streams de progresso (whatsapp_batch_events) deste processo assim
+# que um resultado é gravado; streams em outros workers notam na próxima checagem
+_batch_progress = threading.Condition()
+
+
+def _record_batch_result(batch, item, success, error, guest_type, guest_id):
+    if success:
+        item.status = 'sent'
+        item.sent_at = timezone.now()
+        batch.sent_count = batch.sent_count + 1
+    else:
+        item.status = 'failed'
+        item.error_message = (error or 'Erro desconhecido')[:2000]
+        batch.failed_count = batch.failed_count + 1
+    item.seq = batch.processed_count
+
+    item.save(update_fields=['status', 'error_message', 'sent_at', 'seq'])
+    batch.save(update_fields=['sent_count', 'failed_count'])
+
+    if guest_type == 'guest' and guest_id:
+        guest = Guest.objects.filter(id=guest_id).first()
+        if guest:
+            guest.message_sent = success
+            guest.save(update_fields=['message_sent'])
+    elif guest_type == 'extra' and guest_id:
+        extra_guest = ExtraGuest.objects.filter(id=guest_id).first()
+        if extra_guest:
+            extra_guest.message_sent = success
+            extra_guest.save(update_fields=['message_sent'])
+
+
+def _notify_batch_progress():
+    with _batch_progress:
+        _batch_progress.notify_all()
+
 
 def _send_whatsapp_batch_in_background(batch_id, items_data, message_template, image_bytes, image_name):
     """
@@ -214,43 +217,24 @@ def _send_whatsapp_batch_in_background(batch_id, items_data, message_template, i
             success = False
             error = str(exc)
 
-        if success:
-            item.status = 'sent'
-            item.sent_at = timezone.now()
-            batch.sent_count = batch.sent_count + 1
-        else:
-            item.status = 'failed'
-            item.error_message = (error or 'Erro desconhecido')[:2000]
-            batch.failed_count = batch.failed_count + 1
+        if not success:
             logger.warning(
                 "Falha ao enviar WhatsApp para %s (%s): %s",
-                item.guest_name, item.phone_number, item.error_message
+                item.guest_name, item.phone_number, (error or 'Erro desconhecido')[:2000]
             )
-
-        item.save(update_fields=['status', 'error_message', 'sent_at'])
-        batch.save(update_fields=['sent_count', 'failed_count'])
-
-        guest_id = item_data.get('guest_id')
-        guest_type = item_data.get('guest_type')
-        if guest_type == 'guest' and guest_id:
-            try:
-                guest = Guest.objects.get(id=guest_id)
-                guest.message_sent = success
-                guest.save(update_fields=['message_sent'])
-            except Guest.DoesNotExist:
-                pass
-        elif guest_type == 'extra' and guest_id:
-            try:
-                extra_guest = ExtraGuest.objects.get(id=guest_id)
-                extra_guest.message_sent = success
-                extra_guest.save(update_fields=['message_sent'])
-            except ExtraGuest.DoesNotExist:
-                pass
+        # Item, contadores do batch e convidado numa transação só
+        dbwrites.run(
+            _record_batch_result, batch, item, success, error,
+            item_data.get('guest_type'), item_data.get('guest_id'),
+        )
+        _notify_batch_progress()
 
         time.sleep(WHATSAPP_SEND_DELAY_SECONDS)
 
-    batch.mark_completed()
-    close_old_connections()
+    dbwrites.run(batch.mark_completed)
+    _notify_batch_progress()
+    # Fim da thread: fecha também conexões persistentes (CONN_MAX_AGE)
+    connections.close_all()
 
 @guest_required
 def iniciar_pagamento(request, presente_id):
@@ -265,161 +249,66 @@ def iniciar_pagamento(request, presente_id):
             'mensagem': 'Access Token do Mercado Pago não está configurado. Verifique o arquivo .env'
         })
     
-    # Criar registro de pagamento pendente
-    pagamento = Pagamento.objects.create(
-        presente=presente,
-        valor=presente.valor
-    )
-
-    # If guest is logged in, associate the payment and optionally store a message
-    try:
-        user_id = request.session.get("otp_user_id")
-        if user_id:
-            from .models import Guest
-            try:
-                guest = Guest.objects.get(id=user_id)
-                pagamento.guest = guest
-                pagamento.nome_pagador = guest.name
-            except Guest.DoesNotExist:
-                guest = None
-        # Accept an optional message param from the website or AI tools
-        message = request.POST.get('message') or request.GET.get('message')
-        if message:
-            pagamento.message = message
-        pagamento.save()
-    except Exception:
-        # Do not interrupt the payment flow for non-critical issues
-        pass
-
-    # Preparar dados da preference
-    preference_data = {
-        "items": [
-            {
-                "title": presente.nome,
-                "quantity": 1,
-                "currency_id": "BRL",
-                "unit_price": float(presente.valor)
-            }
-        ],
-        "external_reference": str(pagamento.id),
-        "back_urls": {
-            "success": f"{settings.SITE_URL}/pagamento/sucesso/",
-            "failure": f"{settings.SITE_URL}/pagamento/erro/",
-            "pending": f"{settings.SITE_URL}/pagamento/pendente/",
-        },
-        "notification_url": f"{settings.SITE_URL}/webhook/mercadopago/",
-    }
+    guest = None
+    user_id = request.session.get("otp_user_id")
+    if user_id:
+        guest = Guest.objects.filter(id=user_id).first()
+    # Accept an optional message param from the website or AI tools
+    message = request.POST.get('message') or request.GET.get('message')
 
     try:
-        # Criar preference no Mercado Pago
-        sdk = get_sdk()
-        preference = sdk.preference().create(preference_data)
-        
-        # Verificar resposta
-        if preference.get("status") == 201 and preference.get("response"):
-            init_point = preference["response"].get("init_point")
-            if init_point:
-                try:
-                    notificar_present(pagamento)  # Notify admins of new present
-                except Exception as exc:
-                    print(f"Erro ao notificar admins: {str(exc)}")
-                return redirect(init_point)
-            else:
-                return render(request, 'pagamento/erro.html', {
-                    'mensagem': 'Erro: Checkout URL não retornada pelo Mercado Pago'
-                })
-        else:
-            error_msg = preference.get("response", {}).get("message", "Erro ao criar preferência")
-            return render(request, 'pagamento/erro.html', {
-                'mensagem': f'Erro: {error_msg}'
-            })
+        pagamento, init_point, created = payments.start_checkout(
+            presente.nome, presente.valor, presente=presente, guest=guest, message=message,
+        )
+    except payments.PaymentError as e:
+        return render(request, 'pagamento/erro.html', {
+            'mensagem': f'Erro: {e}'
+        })
     except Exception as e:
-        import traceback
-        print(f"Erro em iniciar_pagamento: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Erro em iniciar_pagamento: %s", e)
         return render(request, 'pagamento/erro.html', {
             'mensagem': f'Erro ao conectar com Mercado Pago: {str(e)}'
         })
 
+    if created:
+        try:
+            notificar_present(pagamento)  # Notify admins of new present
+        except Exception as exc:
+            logger.warning("Erro ao notificar admins: %s", exc)
+    return redirect(init_point)
+
 
 @csrf_exempt
 @require_http_methods(["GET", "POST"])
 def webhook_mercadopago(request):
     """
-    Webhook para receber notificações de pagamento do Mercado Pago
+    Webhook para receber notificações de pagamento do Mercado Pago.
+
+    Só grava a notificação e responde 200; o processamento (consulta ao
+    Mercado Pago, atualização do Pagamento, aviso aos admins) roda em
+    segundo plano via core.webhooks.
     """
     try:
-        # Mercado Pago envia dados via GET ou POST
-        data = request.GET if request.method == "GET" else request.POST
-        
-        payment_id = data.get("id")
-        topic = data.get("topic")
-
-        # Verificar se é notificação de pagamento
-        if topic == "payment" and payment_id:
-            try:
-                # Obter informações do pagamento no Mercado Pago
-                sdk = get_sdk()
-                payment_info = sdk.payment().get(payment_id)
-                info = payment_info["response"]
-
-                # Extrair informações relevantes
-                external_reference = info.get("external_reference")
-                status = info.get("status")
-
-                payer = info.get('payer', {}) or {}
-                payer_email = payer.get('email')
-                payer_name = None
-                if payer.get('first_name') or payer.get('last_name'):
-                    payer_name = (payer.get('first_name','') + ' ' + payer.get('last_name','')).strip()
-                elif payer.get('nickname'):
-                    payer_name = payer.get('nickname')
-
-                # Mapear status do Mercado Pago para nosso status
-                status_map = {
-                    'pending': 'pendente',
-                    'approved': 'aprovado',
-                    'authorized': 'aprovado',
-                    'in_process': 'pendente',
-                    'in_mediation': 'pendente',
-                    'rejected': 'recusado',
-                    'cancelled': 'cancelado',
-                    'refunded': 'cancelado',
-                    'charged_back': 'cancelado',
-                }
-                
-                novo_status = status_map.get(status, 'pendente')
-
-                # Atualizar pagamento no banco
-                if external_reference:
-                    try:
-                        pagamento = Pagamento.objects.get(id=external_reference)
-                        pagamento.mp_payment_id = payment_id
-                        # populate payer info when available
-                        if payer_email:
-                            pagamento.email_pagador = payer_email
-                        if payer_name:
-                            pagamento.nome_pagador = pagamento.nome_pagador or payer_name
-                        previous_status = pagamento.status
-                        pagamento.status = novo_status
-                        pagamento.save()
-
-                        # If payment just became approved, notify admins via WhatsApp
-                        try:
-                            if previous_status != 'aprovado' and novo_status == 'aprovado':
-                                notificar_present(pagamento)
-                        except Exception as exc:
-                            print(f"Erro ao notificar admins via WhatsApp: {str(exc)}")
-                    except Pagamento.DoesNotExist:
-                        pass
-            except Exception as e:
-                print(f"Erro ao processar webhook: {str(e)}")
-
-        return HttpResponse("OK", status=200)
-    
+        topic, resource_id, payload = webhooks.parse_notification(request)
+        webhooks.enqueue(topic, resource_id, payload)
+        webhooks.kick_processor()
     except Exception as e:
-        print(f"Erro no webhook: {str(e)}")
-        return HttpResponse("OK", status=200)
+        logger.exception("Erro no webhook: %s", e)
+
+    return HttpResponse("OK", status=200)
+
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1', '')
+
+
+@require_http_methods(["GET"])
+def prometheus_metrics(request):
+    """Métricas no formato do Prometheus, só para quem acessa direto do servidor."""
+    # Tudo que passa pelo Nginx chega com X-Real-IP/X-Forwarded-For
+    proxied = 'HTTP_X_FORWARDED_FOR' in request.META or 'HTTP_X_REAL_IP' in request.META
+    if proxied or request.META.get('REMOTE_ADDR', '') not in LOCAL_ADDRESSES:
+        raise Http404
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 def pagamento_sucesso(request):
@@ -455,16 +344,85 @@ def confirmacao_familia(request):
     """Redirect to RSVP section on single home page."""
     return redirect(reverse('home') + '#rsvp')
 
+DASHBOARD_PAGE_SIZE = 50
+
+# Ordenações aceitas via ?guest_sort= / ?pag_sort= (nunca repassamos o valor cru ao ORM)
+GUEST_SORTS = {
+    'name': ('name', 'id'),
+    '-name': ('-name', '-id'),
+    'phone': ('phone_number', 'id'),
+    'day1': ('day1_status', 'name'),
+    'day2': ('day2_status', 'name'),
+    'recent': ('-id',),
+}
+PAGAMENTO_SORTS = {
+    'recent': ('-criado_em',),
+    'oldest': ('criado_em',),
+    'valor': ('-valor', '-criado_em'),
+    'status': ('status', '-criado_em'),
+}
+
+
+def _paginate(request, queryset, page_param, tab, per_page=DASHBOARD_PAGE_SIZE):
+    """Pagina o queryset e devolve (page, querystring sem o parâmetro de página)."""
+    page = Paginator(queryset, per_page).get_page(request.GET.get(page_param))
+    page.elided_range = page.paginator.get_elided_page_range(page.number)
+    params = request.GET.copy()
+    params.pop(page_param, None)
+    params['tab'] = tab
+    return page, params.urlencode()
+
+
 # Admin dashboard view
 @wedding_admin_required
 def wedding_admin_dashboard(request):
-    presentes = Presente.objects.all()
-    pagamentos = Pagamento.objects.select_related('presente').all()
-    guests = Guest.objects.all()
+    # Cabeçalho: contadores pré-calculados (core/stats.py), uma consulta só
+    stats = get_dashboard_stats()
+    presentes = list(Presente.objects.all())
+    for presente in presentes:
+        presente.arrecadado = stats['approved_by_presente'].get(presente.id)
+
+    # Pagamentos: presente e guest vêm no mesmo JOIN (a tabela mostra ambos)
+    pag_status = request.GET.get('pag_status', 'all')
+    pag_sort = request.GET.get('pag_sort', 'recent')
+    pagamentos = Pagamento.objects.select_related('presente', 'guest')
+    if pag_status in dict(Pagamento.STATUS_CHOICES):
+        pagamentos = pagamentos.filter(status=pag_status)
+    pagamentos = pagamentos.order_by(*PAGAMENTO_SORTS.get(pag_sort, PAGAMENTO_SORTS['recent']))
+    pagamentos_page, pagamentos_query = _paginate(request, pagamentos, 'pag_page', 'pagamentos')
+
+    # Convidados: extras carregados com um único prefetch por página
+    guest_q = request.GET.get('guest_q', '').strip()
+    guest_sort = request.GET.get('guest_sort', 'name')
+    guests = Guest.objects.prefetch_related(
+        Prefetch('extra_guests', queryset=ExtraGuest.objects.order_by('id'))
+    )
+    if guest_q:
+        guests = guests.filter(
+            Q(name__icontains=guest_q)
+            | Q(phone_number__icontains=guest_q)
+            | Q(extra_guests__name__icontains=guest_q)
+            | Q(extra_guests__phone_number__icontains=guest_q)
+        ).distinct()
+    guests = guests.order_by(*GUEST_SORTS.get(guest_sort, GUEST_SORTS['name']))
+    guests_page, guests_query = _paginate(request, guests, 'guest_page', 'convidados')
+
+    active_tab = request.GET.get('tab')
+    if active_tab not in ('presentes', 'pagamentos', 'convidados'):
+        active_tab = 'presentes'
+
     return render(request, 'admin_dashboard.html', {
+        'stats': stats,
         'presentes': presentes,
-        'pagamentos': pagamentos,
-        'guests': guests,
+        'pagamentos': pagamentos_page,
+        'pagamentos_query': pagamentos_query,
+        'pag_status': pag_status,
+        'pag_sort': pag_sort,
+        'guests': guests_page,
+        'guests_query': guests_query,
+        'guest_q': guest_q,
+        'guest_sort': guest_sort,
+        'active_tab': active_tab,
     })
 
 # CRUD for Presente
@@ -588,55 +546,112 @@ def admin_delete_extra_guest(request, pk):
         return redirect('admin_edit_guest', pk=main_guest_id)
     return render(request, 'admin/confirm_delete.html', {'object': extra, 'type': 'Convidado Extra'})
 
-@wedding_admin_required
-def send_whatsapp_mass(request):
-    selected_status = request.POST.get("status", request.GET.get("status", "all"))
-    selected_day = request.POST.get("day", request.GET.get("day", "all"))
-    
-    # In GET requests, selected_guests comes from the URL (if any).
-    # In POST requests, it comes from form submissions.
-    # We expect 'guest-ID' or 'extra-ID' format.
-    selected_guests_from_request = request.POST.getlist("selected_guests") if request.method == "POST" else request.GET.getlist("selected_guests")
-    selected_guest_identifiers = set(selected_guests_from_request)
-
-    # Filtra apenas convidados com telefone preenchido
-    guests_queryset = Guest.objects.exclude(phone_number__isnull=True).exclude(phone_number="")
-    extra_guests_queryset = ExtraGuest.objects.exclude(phone_number__isnull=True).exclude(phone_number="")
-
-    status_map = {
-        'confirmed': 'confirmed',
-        'not_answered': 'pending',
-        'rejected': 'rejected',
-    }
+RSVP_STATUS_MAP = {
+    'confirmed': 'confirmed',
+    'not_answered': 'pending',
+    'rejected': 'rejected',
+}
 
+
+def filter_by_rsvp(queryset, selected_status, selected_day):
+    """
+    Aplica os seletores de status/dia do envio em massa (e dos exports) a um
+    queryset de Guest ou ExtraGuest.
+    """
     if selected_status == 'not_sent':
-        guests_queryset = guests_queryset.filter(message_sent=False)
-        extra_guests_queryset = extra_guests_queryset.filter(message_sent=False)
-    else:
-        if selected_status in status_map:
-            if selected_day in ("day1", "day2"):
-                field = 'day1_status' if selected_day == 'day1' else 'day2_status'
-                guests_queryset = guests_queryset.filter(**{field: status_map[selected_status]})
-                extra_guests_queryset = extra_guests_queryset.filter(**{field: status_map[selected_status]})
-            else:
-                if selected_status == "confirmed":
-                    guests_queryset = guests_queryset.filter(Q(day1_status='confirmed') | Q(day2_status='confirmed'))
-                    extra_guests_queryset = extra_guests_queryset.filter(Q(day1_status='confirmed') | Q(day2_status='confirmed'))
-                elif selected_status == "not_answered":
-                    guests_queryset = guests_queryset.filter(Q(day1_status='pending') | Q(day2_status='pending'))
-                    extra_guests_queryset = extra_guests_queryset.filter(Q(day1_status='pending') | Q(day2_status='pending'))
-                elif selected_status == "rejected":
-                    guests_queryset = guests_queryset.filter(Q(day1_status='rejected') | Q(day2_status='rejected'))
-                    extra_guests_queryset = extra_guests_queryset.filter(Q(day1_status='rejected') | Q(day2_status='rejected'))
-
-    # Add 'identifier' attribute to each guest for unique identification
-    all_guests_with_identifiers = []
-    for guest in guests_queryset:
-        guest.identifier = f"guest-{guest.id}"
-        all_guests_with_identifiers.append(guest)
-    for extra_guest in extra_guests_queryset:
-        extra_guest.identifier = f"extra-{extra_guest.id}"
-        all_guests_with_identifiers.append(extra_guest)
+        return queryset.filter(message_sent=False)
+    if selected_status not in RSVP_STATUS_MAP:
+        return queryset
+    status = RSVP_STATUS_MAP[selected_status]
+    if selected_day in ("day1", "day2"):
+        field = 'day1_status' if selected_day == 'day1' else 'day2_status'
+        return queryset.filter(**{field: status})
+    return queryset.filter(Q(day1_status=status) | Q(day2_status=status))
+
+
+@wedding_admin_required
+def export_guests(request):
+    """Lista de convidados (principais + extras) para buffet/local, em streaming."""
+    selected_status = request.GET.get("status", "all")
+    selected_day = request.GET.get("day", "all")
+    guests = filter_by_rsvp(Guest.objects.all(), selected_status, selected_day)
+    extras = filter_by_rsvp(ExtraGuest.objects.all(), selected_status, selected_day)
+    return exports.export_response(
+        'convidados', exports.GUEST_HEADER, exports.guest_rows(guests, extras),
+        fmt=request.GET.get('format', 'csv'),
+    )
+
+
+@wedding_admin_required
+def export_pagamentos(request):
+    """Pagamentos com presente, pagador e mensagem, em streaming."""
+    pagamentos = Pagamento.objects.all()
+    status = request.GET.get('status', 'all')
+    if status in dict(Pagamento.STATUS_CHOICES):
+        pagamentos = pagamentos.filter(status=status)
+    return exports.export_response(
+        'pagamentos', exports.PAGAMENTO_HEADER, exports.pagamento_rows(pagamentos),
+        fmt=request.GET.get('format', 'csv'),
+    )
+
+
+RECIPIENTS_PAGE_SIZE = 50
+RECIPIENTS_MAX_PAGE_SIZE = 200
+
+
+def mass_send_recipients(params, only=None, exclude=None):
+    """
+    Destinatários possíveis do envio em massa para os filtros em `params`
+    (status, day, q): convidados e extras com telefone, numa consulta só
+    (core/people.py), principais primeiro.
+    """
+    status = params.get("status", "all")
+    day = params.get("day", "all")
+    search = params.get("q", "").strip()
+
+    def narrow(queryset):
+        queryset = queryset.exclude(phone_number__isnull=True).exclude(phone_number="")
+        if search:
+            queryset = queryset.filter(Q(name__icontains=search) | Q(phone_number__icontains=search))
+        return filter_by_rsvp(queryset, status, day)
+
+    return people.people(narrow=narrow, only=only, exclude=exclude).order_by('-kind', 'id')
+
+
+@wedding_admin_required
+def send_whatsapp_recipients(request):
+    """Página de destinatários (JSON) para o seletor do envio em massa."""
+    try:
+        page_size = min(max(int(request.GET.get("page_size", RECIPIENTS_PAGE_SIZE)), 1), RECIPIENTS_MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = RECIPIENTS_PAGE_SIZE
+    page = Paginator(mass_send_recipients(request.GET), page_size).get_page(request.GET.get("page"))
+    return JsonResponse({
+        "count": page.paginator.count,
+        "page": page.number,
+        "num_pages": page.paginator.num_pages,
+        "results": [
+            {
+                "identifier": person['identifier'],
+                "kind": person['kind'],
+                "name": person['name'],
+                "phone": person['phone_number'],
+                "day1_status": person['day1_status'],
+                "day2_status": person['day2_status'],
+                "message_sent": person['message_sent'],
+            }
+            for person in page.object_list
+        ],
+    })
+
+
+@wedding_admin_required
+def send_whatsapp_mass(request):
+    params = request.POST if request.method == "POST" else request.GET
+    selected_status = params.get("status", "all")
+    selected_day = params.get("day", "all")
+    # Identifiers 'guest-ID' / 'extra-ID' (na URL, para abrir a tela com alguém marcado)
+    selected_guest_identifiers = params.getlist("selected_guests")
 
     if request.method == "POST":
         form = WhatsAppMessageForm(request.POST, request.FILES)
@@ -644,26 +659,18 @@ def send_whatsapp_mass(request):
             message_template = form.cleaned_data["message"]
             image = form.cleaned_data.get("image")
 
-            # Filter guests based on selected_guest_identifiers
-            guests_to_send = [
-                g for g in all_guests_with_identifiers
-                if getattr(g, "phone_number", None) and g.identifier in selected_guest_identifiers
-            ]
+            # "Todos do filtro" (menos os desmarcados) ou só os marcados; em
+            # ambos os casos os destinatários saem de uma consulta com o filtro da tela
+            if request.POST.get("select_all") == "1":
+                recipients = mass_send_recipients(request.POST, exclude=request.POST.getlist("excluded_guests"))
+            else:
+                recipients = mass_send_recipients(request.POST, only=selected_guest_identifiers)
+            guests_to_send = list(recipients)
 
             if not guests_to_send:
                 messages.error(request, "Nenhum convidado válido com telefone selecionado para envio.")
                 return redirect(reverse("send_whatsapp_mass"))
 
-            batch_ja_rodando = WhatsAppBatch.objects.filter(status='running').first()
-            if batch_ja_rodando:
-                messages.error(
-                    request,
-                    "Já existe um envio em andamento (iniciado em "
-                    f"{batch_ja_rodando.created_at.strftime('%d/%m %H:%M')}). "
-                    "Aguarde ele terminar antes de iniciar outro."
-                )
-                return redirect(reverse("whatsapp_batch_status", args=[batch_ja_rodando.id]))
-
             image_bytes = None
             image_name = None
             if image:
@@ -671,28 +678,41 @@ def send_whatsapp_mass(request):
                 image_bytes = image.read()
                 image_name = image.name
 
-            batch = WhatsAppBatch.objects.create(
-                created_by=getattr(request.user, 'username', '') if request.user.is_authenticated else '',
-                message_template=message_template,
-                total=len(guests_to_send),
-            )
-
-            items_data = []
-            for guest in guests_to_send:
-                # Extract guest_id and guest_type from the identifier
-                guest_type, guest_id = guest.identifier.split('-')
-                item = WhatsAppBatchItem.objects.create(
-                    batch=batch,
-                    guest_name=getattr(guest, "name", str(guest)),
-                    phone_number=guest.phone_number,
+            # A restrição core_single_running_batch garante um envio por vez,
+            # mesmo com dois POSTs simultâneos
+            try:
+                with transaction.atomic():
+                    batch = WhatsAppBatch.objects.create(
+                        created_by=getattr(request.user, 'username', '') if request.user.is_authenticated else '',
+                        message_template=message_template,
+                        total=len(guests_to_send),
+                    )
+            except IntegrityError:
+                batch_ja_rodando = WhatsAppBatch.objects.filter(status='running').first()
+                if batch_ja_rodando is None:
+                    raise
+                messages.error(
+                    request,
+                    "Já existe um envio em andamento (iniciado em "
+                    f"{batch_ja_rodando.created_at.strftime('%d/%m %H:%M')}). "
+                    "Aguarde ele terminar antes de iniciar outro."
                 )
-                items_data.append({
+                return redirect(reverse("whatsapp_batch_status", args=[batch_ja_rodando.id]))
+
+            items = WhatsAppBatchItem.objects.bulk_create([
+                WhatsAppBatchItem(batch=batch, guest_name=person['name'], phone_number=person['phone_number'])
+                for person in guests_to_send
+            ])
+            items_data = [
+                {
                     'item_id': item.id,
                     'name': item.guest_name,
                     'phone': item.phone_number,
-                    'guest_id': guest_id, # Use the extracted ID
-                    'guest_type': guest_type, # Use the extracted type
-                })
+                    'guest_id': person['id'],
+                    'guest_type': person['kind'],
+                }
+                for item, person in zip(items, guests_to_send)
+            ]
 
             thread = threading.Thread(
                 target=_send_whatsapp_batch_in_background,
@@ -705,12 +725,12 @@ def send_whatsapp_mass(request):
     else:
         form = WhatsAppMessageForm(initial={"status": selected_status})
 
+    # A lista de destinatários é carregada por página de send_whatsapp_recipients
     return render(request, "admin/send_whatsapp.html", {
         "form": form,
-        "guests": all_guests_with_identifiers, # Pass the list with identifiers
         "selected_status": selected_status,
         "selected_day": selected_day,
-        "selected_guest_identifiers": selected_guest_identifiers, # Pass the set of identifiers for checking 'checked' state
+        "selected_guest_identifiers": selected_guest_identifiers,
     })
 
 
@@ -720,23 +740,107 @@ def whatsapp_batch_status(request, batch_id):
     return render(request, "admin/whatsapp_batch_status.html", {"batch": batch})
 
 
-@wedding_admin_required
-def whatsapp_batch_status_json(request, batch_id):
-    batch = get_object_or_404(WhatsAppBatch, id=batch_id)
-    items = batch.items.all()
+BATCH_PROGRESS_MAX_ITEMS = 500
+# Cada stream SSE ocupa uma thread do gunicorn enquanto está aberto (por isso
+# o new_server.sh usa workers gthread, não síncronos); ele fecha depois de
+# alguns segundos e o EventSource reconecta com Last-Event-ID
+BATCH_EVENTS_MAX_SECONDS = getattr(settings, 'BATCH_EVENTS_MAX_SECONDS', 20)
+BATCH_EVENTS_POLL_SECONDS = getattr(settings, 'BATCH_EVENTS_POLL_SECONDS', 1.0)
 
-    return JsonResponse({
+
+def _batch_item_json(item):
+    return {
+        "id": item.id,
+        "seq": item.seq,
+        "name": item.guest_name,
+        "phone": item.phone_number,
+        "status": item.status,
+        "error": item.error_message,
+    }
+
+
+def _batch_counters(batch):
+    return {
         "status": batch.status,
         "total": batch.total,
         "sent_count": batch.sent_count,
         "failed_count": batch.failed_count,
-        "items": [
-            {
-                "name": i.guest_name,
-                "phone": i.phone_number,
-                "status": i.status,
-                "error": i.error_message,
-            }
-            for i in items
-        ],
-    })
\ No newline at end of file
+    }
+
+
+def _batch_progress_since(batch, since):
+    """
+    Contadores e itens com resultado gravado depois do cursor `since` (seq),
+    no máximo BATCH_PROGRESS_MAX_ITEMS; "cursor" é o seq do último item
+    devolvido, para a próxima chamada.
+    """
+    items = list(batch.items.filter(seq__gt=since).order_by('seq')[:BATCH_PROGRESS_MAX_ITEMS])
+    return {
+        **_batch_counters(batch),
+        "cursor": items[-1].seq if items else since,
+        "items": [_batch_item_json(i) for i in items],
+    }
+
+
+def _parse_cursor(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+@wedding_admin_required
+def whatsapp_batch_status_json(request, batch_id):
+    """
+    Progresso do batch. Com `?since=<cursor>` devolve só os itens que mudaram
+    depois do cursor; sem ele, a lista completa (com os pendentes).
+    """
+    batch = get_object_or_404(WhatsAppBatch, id=batch_id)
+    if "since" in request.GET:
+        return JsonResponse(_batch_progress_since(batch, _parse_cursor(request.GET["since"])))
+
+    return JsonResponse({
+        **_batch_counters(batch),
+        "cursor": batch.processed_count,
+        "items": [_batch_item_json(i) for i in batch.items.all()],
+    })
+
+
+def _batch_events(batch_id, cursor):
+    yield f"retry: {int(BATCH_EVENTS_POLL_SECONDS * 1000)}\n\n"
+    deadline = time.monotonic() + BATCH_EVENTS_MAX_SECONDS
+    while True:
+        # Só os contadores (pela PK) a cada volta; itens só quando algo mudou
+        batch = WhatsAppBatch.objects.filter(id=batch_id).only(
+            'status', 'total', 'sent_count', 'failed_count',
+        ).first()
+        if batch is None:
+            return
+        if batch.processed_count > cursor:
+            data = _batch_progress_since(batch, cursor)
+            # Itens já apagados pelo housekeeping: pula para os contadores
+            cursor = data["cursor"] = data["cursor"] if data["items"] else batch.processed_count
+            yield f"id: {cursor}\nevent: progress\ndata: {json.dumps(data)}\n\n"
+            continue
+        if batch.status != 'running':
+            yield f"id: {cursor}\nevent: done\ndata: {json.dumps(_batch_counters(batch))}\n\n"
+            return
+        if time.monotonic() >= deadline:
+            return
+        with _batch_progress:
+            _batch_progress.wait(BATCH_EVENTS_POLL_SECONDS)
+
+
+@wedding_admin_required
+def whatsapp_batch_events(request, batch_id):
+    """
+    Server-Sent Events com o progresso do batch: um evento "progress" com os
+    contadores e os itens novos a cada resultado gravado e um "done" no fim.
+    O cursor vem do Last-Event-ID (reconexão) ou de `?since=`.
+    """
+    get_object_or_404(WhatsAppBatch.objects.only('id'), id=batch_id)
+    cursor = _parse_cursor(request.headers.get("Last-Event-ID", request.GET.get("since")))
+    response = StreamingHttpResponse(_batch_events(batch_id, cursor), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # nginx repassa cada evento sem bufferizar
+    return response
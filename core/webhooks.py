@@ -0,0 +1,281 @@
+"""
+Processamento das notificações do Mercado Pago fora do request.
+
+O webhook só grava a notificação em MercadoPagoNotification e chama
+`kick_processor()`, que sobe (no máximo) uma thread por processo para
+esvaziar a fila: consulta o pagamento no Mercado Pago, atualiza o Pagamento
+e avisa os admins quando ele acaba de ser aprovado. O comando
+`manage.py process_webhooks` faz o mesmo trabalho via cron, recuperando o que
+ficou para trás se o processo morrer no meio.
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .payments import get_sdk
+from . import metrics
+from .models import MercadoPagoNotification, Pagamento
+from .notifications import notificar_present
+from .workers import BackgroundWorker
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+
+# Notificações "processing" há mais tempo que isso são consideradas abandonadas
+STALE_AFTER = timedelta(minutes=5)
+
+# Espera mínima antes de tentar de novo uma notificação que falhou
+RETRY_AFTER = timedelta(minutes=1)
+
+# Consultas recentes a /v1/payments ficam em cache por alguns segundos: o
+# Mercado Pago reenvia a mesma notificação várias vezes (GET e POST).
+PAYMENT_CACHE_TTL = 60
+
+# Cópia de uma notificação já processada há menos que isso é descartada sem
+# consultar o Mercado Pago. Uma mudança de status real que caia nessa janela
+# é recuperada pelo reconcile_payments.
+DUPLICATE_WINDOW = timedelta(seconds=PAYMENT_CACHE_TTL)
+
+# Mapear status do Mercado Pago para nosso status
+STATUS_MAP = {
+    'pending': 'pendente',
+    'approved': 'aprovado',
+    'authorized': 'aprovado',
+    'in_process': 'pendente',
+    'in_mediation': 'pendente',
+    'rejected': 'recusado',
+    'cancelled': 'cancelado',
+    'refunded': 'cancelado',
+    'charged_back': 'cancelado',
+}
+
+
+def parse_notification(request):
+    """Extrai (topic, id) dos formatos antigo (?topic=&id=) e novo (JSON type/data.id)."""
+    # O Mercado Pago manda os parâmetros na query string mesmo em POST
+    data = request.GET.copy()
+    if request.method == "POST":
+        data.update(request.POST)
+    topic = data.get("topic") or data.get("type")
+    resource_id = data.get("id") or data.get("data.id")
+    payload = {key: data.get(key) for key in data}
+
+    if request.method == "POST" and request.content_type == "application/json":
+        try:
+            body = json.loads(request.body or b'{}')
+        except ValueError:
+            body = {}
+        if isinstance(body, dict):
+            payload = body
+            topic = topic or body.get("topic") or body.get("type")
+            resource_id = resource_id or (body.get("data") or {}).get("id") or body.get("id")
+
+    return (topic or ''), str(resource_id or ''), payload
+
+
+def enqueue(topic, resource_id, payload):
+    """
+    Grava a notificação, a não ser que uma do mesmo recurso já esteja
+    esperando na fila (restrição core_mp_notification_one_pending).
+    """
+    topic, resource_id = topic[:50], resource_id[:255]
+    while True:
+        try:
+            with transaction.atomic():
+                return MercadoPagoNotification.objects.create(topic=topic, resource_id=resource_id, payload=payload)
+        except IntegrityError:
+            waiting = MercadoPagoNotification.objects.filter(
+                topic=topic, resource_id=resource_id, status='pending',
+            ).first()
+            # None: a da fila foi pega pelo processador entre o INSERT e a leitura
+            if waiting is not None:
+                return waiting
+
+
+def _handled_elsewhere(notification):
+    """Outra cópia do mesmo recurso está sendo processada agora ou acabou de ser."""
+    now = timezone.now()
+    return MercadoPagoNotification.objects.filter(
+        Q(status='processing', locked_at__gte=now - STALE_AFTER)
+        | Q(status='done', processed_at__gte=now - DUPLICATE_WINDOW),
+        topic=notification.topic, resource_id=notification.resource_id,
+    ).exclude(id=notification.id).exists()
+
+
+def event_key(topic, resource_id, status):
+    return hashlib.sha1(f"{topic}:{resource_id}:{status}".encode('utf-8')).hexdigest()
+
+
+def fetch_payment(sdk, payment_id):
+    """GET /v1/payments/<id> com cache curto; só respostas 200 são guardadas."""
+    cache_key = f"mp:payment:{payment_id}"
+    info = cache.get(cache_key)
+    if info is not None:
+        return info
+    payment_info = sdk.payment().get(payment_id)
+    if payment_info.get("status") != 200:
+        raise RuntimeError(f"Mercado Pago respondeu {payment_info.get('status')}")
+    info = payment_info["response"]
+    cache.set(cache_key, info, PAYMENT_CACHE_TTL)
+    return info
+
+
+def _payer_name(payer):
+    if payer.get('first_name') or payer.get('last_name'):
+        return f"{payer.get('first_name') or ''} {payer.get('last_name') or ''}".strip()
+    return payer.get('nickname')
+
+
+def apply_payment_info(payment_id, info):
+    """
+    Atualiza o Pagamento referenciado por `info` (resposta de /v1/payments).
+    Retorna o Pagamento (ou None) e se ele acabou de ser aprovado.
+
+    A linha fica travada (select_for_update) durante a transição, então duas
+    entregas simultâneas não conseguem ambas ver "ainda não aprovado".
+    """
+    external_reference = info.get("external_reference")
+    if not external_reference:
+        return None, False
+
+    payer = info.get('payer', {}) or {}
+    payer_email = payer.get('email')
+    payer_name = _payer_name(payer)
+    novo_status = STATUS_MAP.get(info.get("status"), 'pendente')
+
+    with transaction.atomic():
+        try:
+            pagamento = (
+                Pagamento.objects.select_for_update(of=('self',))
+                .select_related('presente', 'guest')
+                .get(id=external_reference)
+            )
+        except (Pagamento.DoesNotExist, ValueError):
+            return None, False
+
+        previous = (pagamento.status, pagamento.mp_payment_id, pagamento.email_pagador, pagamento.nome_pagador)
+        pagamento.mp_payment_id = str(payment_id)
+        # populate payer info when available
+        if payer_email:
+            pagamento.email_pagador = payer_email
+        if payer_name:
+            pagamento.nome_pagador = pagamento.nome_pagador or payer_name
+        pagamento.status = novo_status
+
+        # Entrega repetida sem mudança nenhuma: nada a gravar
+        if previous != (pagamento.status, pagamento.mp_payment_id, pagamento.email_pagador, pagamento.nome_pagador):
+            pagamento.save()
+
+    return pagamento, previous[0] != 'aprovado' and novo_status == 'aprovado'
+
+
+def process_notification(notification, sdk=None):
+    """Processa uma notificação; erros ficam registrados nela para nova tentativa."""
+    with metrics.WEBHOOK_PROCESS_SECONDS.time(outcome='ok') as labels:
+        labels['outcome'] = _process_notification(notification, sdk)
+
+
+def _process_notification(notification, sdk):
+    if notification.topic != 'payment' or not notification.resource_id:
+        notification.status = 'done'
+        notification.processed_at = timezone.now()
+        notification.save(update_fields=['status', 'processed_at'])
+        return 'ignored'
+
+    if _handled_elsewhere(notification):
+        # Reentrega: nenhuma consulta ao Mercado Pago
+        notification.attempts += 1
+        notification.status = 'done'
+        notification.processed_at = timezone.now()
+        notification.save(update_fields=['attempts', 'status', 'processed_at'])
+        return 'duplicate'
+
+    try:
+        info = fetch_payment(sdk or get_sdk(), notification.resource_id)
+        notification.event_key = event_key(notification.topic, notification.resource_id, info.get("status"))
+        if MercadoPagoNotification.objects.filter(event_key=notification.event_key, status='done').exists():
+            # Mesmo evento já aplicado por outra entrega
+            pagamento, just_approved, outcome = None, False, 'duplicate'
+        else:
+            pagamento, just_approved = apply_payment_info(notification.resource_id, info)
+            outcome = 'ok'
+    except Exception as exc:
+        notification.attempts += 1
+        notification.last_error = str(exc)[:2000]
+        notification.status = 'failed' if notification.attempts >= MAX_ATTEMPTS else 'pending'
+        try:
+            with transaction.atomic():
+                notification.save(update_fields=['attempts', 'last_error', 'status'])
+        except IntegrityError:
+            # Outra entrega do mesmo recurso já está na fila e fará a nova tentativa
+            notification.status = 'failed'
+            notification.save(update_fields=['attempts', 'last_error', 'status'])
+        logger.warning("Erro ao processar notificação %s do Mercado Pago: %s", notification.id, exc)
+        return 'error'
+
+    notification.attempts += 1
+    notification.status = 'done'
+    notification.processed_at = timezone.now()
+    notification.save(update_fields=['attempts', 'event_key', 'status', 'processed_at'])
+
+    if just_approved:
+        notify_approved(pagamento)
+    return outcome
+
+
+def notify_approved(pagamento):
+    """If payment just became approved, notify admins via WhatsApp"""
+    try:
+        notificar_present(pagamento)
+    except Exception as exc:
+        logger.warning("Erro ao notificar admins via WhatsApp: %s", exc)
+
+
+def _claim_next():
+    """Marca a próxima notificação pendente como 'processing' (UPDATE condicional)."""
+    now = timezone.now()
+    claimable = (
+        Q(status='pending', locked_at__isnull=True)
+        | Q(status='pending', locked_at__lt=now - RETRY_AFTER)
+        | Q(status='processing', locked_at__lt=now - STALE_AFTER)
+    )
+    for notification in MercadoPagoNotification.objects.filter(claimable).order_by('id')[:10]:
+        claimed = MercadoPagoNotification.objects.filter(
+            claimable, id=notification.id,
+        ).update(status='processing', locked_at=now)
+        if claimed:
+            notification.status = 'processing'
+            notification.locked_at = now
+            return notification
+    return None
+
+
+def process_pending(limit=None, sdk=None):
+    """Esvazia a fila (ou até `limit` notificações). Retorna quantas foram processadas."""
+    processed = 0
+    while limit is None or processed < limit:
+        notification = _claim_next()
+        if notification is None:
+            break
+        process_notification(notification, sdk=sdk)
+        processed += 1
+    return processed
+
+
+def _drain():
+    process_pending()
+
+
+_worker = BackgroundWorker('mp-webhook-worker', _drain)
+
+
+def kick_processor():
+    """Garante uma thread processando a fila neste processo."""
+    _worker.kick()
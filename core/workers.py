@@ -0,0 +1,53 @@
+import logging
+import threading
+
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundWorker:
+    """
+    No máximo uma thread por processo rodando `target` enquanto houver trabalho.
+
+    `kick()` acorda (ou cria) a thread. `target()` processa o que estiver
+    pronto e retorna quantos segundos esperar pelo próximo item agendado, ou
+    None quando não há mais nada; nesse caso a thread termina.
+    """
+
+    def __init__(self, name, target):
+        self.name = name
+        self.target = target
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        try:
+            while True:
+                self._wake.clear()
+                # Entre rodadas a conexão pode ter passado do CONN_MAX_AGE ou caído
+                close_old_connections()
+                try:
+                    wait = self.target()
+                except Exception:
+                    logger.exception("Worker %s falhou", self.name)
+                    wait = None
+                if wait:
+                    self._wake.wait(wait)
+                    continue
+                # Decide sair sob o lock para não perder um kick que chegou agora
+                with self._lock:
+                    if not self._wake.is_set():
+                        self._thread = None
+                        return
+        finally:
+            # A thread acaba aqui: conexões persistentes (CONN_MAX_AGE) ficariam órfãs
+            connections.close_all()
+
+    def kick(self):
+        with self._lock:
+            self._wake.set()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
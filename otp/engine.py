@@ -0,0 +1,160 @@
+"""
+Códigos OTP, limites de tentativa e envio em segundo plano.
+
+- Códigos: só o HMAC do código fica no cache, por telefone, com TTL
+  (OTP_CODE_TTL). Cada código vale uma vez e aceita até MAX_VERIFY_ATTEMPTS
+  erros antes de ser descartado.
+- Limites: janela deslizante (contador da janela atual + fração da anterior)
+  por telefone e por IP, também no cache.
+- Envio: `deliver` só põe o código numa fila em memória e acorda um worker,
+  que chama o serviço de WhatsApp; a página de login responde na hora.
+
+Com vários workers do gunicorn o cache precisa ser compartilhado (CACHE_DIR),
+senão a verificação pode cair num processo que não conhece o código.
+"""
+import logging
+import math
+import queue
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from core.workers import BackgroundWorker
+
+from .services import send_whatsapp_otp
+
+logger = logging.getLogger(__name__)
+
+MAX_VERIFY_ATTEMPTS = 5
+
+# (limite, janela em segundos)
+SEND_LIMIT_PER_PHONE = (3, 10 * 60)
+SEND_LIMIT_PER_IP = (20, 60 * 60)
+VERIFY_LIMIT_PER_PHONE = (10, 10 * 60)
+VERIFY_LIMIT_PER_IP = (30, 10 * 60)
+
+VALID, INVALID, EXPIRED = 'valid', 'invalid', 'expired'
+
+
+# ----------------------------------------------------------------------
+# Códigos
+# ----------------------------------------------------------------------
+
+def _code_key(phone):
+    return f"otp:code:{phone}"
+
+
+def _hash(phone, code):
+    return salted_hmac('otp.engine', f"{phone}:{code}").hexdigest()
+
+
+def issue(phone):
+    """Gera um código novo para o telefone (invalida o anterior) e o retorna."""
+    code = str(10000 + secrets.randbelow(90000))
+    ttl = settings.OTP_CODE_TTL
+    cache.set(_code_key(phone), {
+        'hash': _hash(phone, code),
+        'attempts': 0,
+        'expires': time.time() + ttl,
+    }, ttl)
+    return code
+
+
+def verify(phone, code):
+    """VALID (e consome o código), INVALID ou EXPIRED (inexistente, vencido ou tentativas esgotadas)."""
+    key = _code_key(phone)
+    entry = cache.get(key)
+    if entry is None or entry['expires'] <= time.time():
+        return EXPIRED
+    if constant_time_compare(entry['hash'], _hash(phone, (code or '').strip())):
+        cache.delete(key)
+        return VALID
+    entry['attempts'] += 1
+    if entry['attempts'] >= MAX_VERIFY_ATTEMPTS:
+        cache.delete(key)
+        return EXPIRED
+    cache.set(key, entry, max(1, math.ceil(entry['expires'] - time.time())))
+    return INVALID
+
+
+# ----------------------------------------------------------------------
+# Limites
+# ----------------------------------------------------------------------
+
+def hit(scope, ident, limit, window):
+    """
+    Conta uma tentativa de `ident` em `scope`. Retorna (permitido, segundos
+    para tentar de novo). Janela deslizante aproximada: contagem da janela
+    atual + a da anterior ponderada pelo quanto dela ainda cabe na janela.
+    """
+    now = time.time()
+    bucket = int(now // window)
+    current_key = f"rl:{scope}:{ident}:{bucket}"
+    previous_key = f"rl:{scope}:{ident}:{bucket - 1}"
+    counts = cache.get_many([previous_key, current_key])
+    elapsed = (now % window) / window
+    estimated = counts.get(previous_key, 0) * (1 - elapsed) + counts.get(current_key, 0)
+    if estimated >= limit:
+        return False, math.ceil(window - now % window)
+
+    if not cache.add(current_key, 1, window * 2):
+        try:
+            cache.incr(current_key)
+        except ValueError:  # expirou entre o add e o incr
+            cache.set(current_key, 1, window * 2)
+    return True, 0
+
+
+def check_limits(checks):
+    """checks: [(scope, ident, (limite, janela))]. Retorna os segundos de espera (0 = liberado)."""
+    retry_after = 0
+    for scope, ident, (limit, window) in checks:
+        if not ident:
+            continue
+        allowed, wait = hit(scope, ident, limit, window)
+        if not allowed:
+            retry_after = max(retry_after, wait)
+    return retry_after
+
+
+def client_ip(request):
+    # Atrás do nginx (socket unix) o REMOTE_ADDR vem vazio; o nginx sempre
+    # sobrescreve o X-Real-IP com o IP de quem conectou.
+    return request.META.get('HTTP_X_REAL_IP') or request.META.get('REMOTE_ADDR') or ''
+
+
+# ----------------------------------------------------------------------
+# Envio
+# ----------------------------------------------------------------------
+
+_outbox = queue.SimpleQueue()
+
+
+def deliver(phone, code):
+    """Agenda o envio do código pelo WhatsApp e retorna na hora."""
+    _outbox.put((phone, code))
+    kick_delivery()
+
+
+def send_queued():
+    while True:
+        try:
+            phone, code = _outbox.get_nowait()
+        except queue.Empty:
+            return None
+        try:
+            success, error = send_whatsapp_otp(phone, code)
+        except Exception as exc:
+            success, error = False, str(exc)
+        if not success:
+            logger.warning("Não foi possível enviar OTP para %s: %s", phone, error)
+
+
+_worker = BackgroundWorker('otp-delivery', send_queued)
+
+
+def kick_delivery():
+    _worker.kick()
@@ -0,0 +1,16 @@
+# Generated by Django 4.2.27 on 2026-10-19 13:53
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('otp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='OTP',
+        ),
+    ]
@@ -2,10 +2,15 @@ import logging
 import requests
 from django.conf import settings
 
-from core.models import ExtraGuest, Guest
+from core import metrics, people, profiling
+from core.models import Guest
 
 logger = logging.getLogger(__name__)
 
+# Sessão compartilhada (keep-alive) para o serviço de WhatsApp
+sidecar_session = requests.Session()
+sidecar_session.hooks = profiling.http_hooks()
+
 
 def extract_digits(value: str) -> str:
     return "".join(ch for ch in value if ch.isdigit())
@@ -73,64 +78,47 @@ def find_user_by_phone(phone: str, country_code: str = None):
     normalized = normalize_phone_number(phone, country_code)
     variants = phone_candidate_variants(normalized)
 
-    for candidate in variants:
-        try:
-            return Guest.objects.get(phone_number=candidate), False, candidate
-        except Guest.DoesNotExist:
-            pass
+    # Convidados e extras numa consulta; o principal tem preferência
+    person = people.find_by_phone(variants)
+    if person is None:
+        return None, False, ""
+    guest = Guest.objects.filter(id=person['group_id']).first()
+    if guest is None:
+        return None, False, ""
+    return guest, person['kind'] == people.EXTRA, person['phone_number']
 
-    for candidate in variants:
-        try:
-            extra = ExtraGuest.objects.get(phone_number=candidate)
-            return extra.main_guest, True, candidate
-        except ExtraGuest.DoesNotExist:
-            pass
 
-    return None, False, ""
+def post_to_sidecar(endpoint, error_message, **kwargs):
+    """POST no serviço de WhatsApp, medindo latência e resultado. Returns (success, error_message)."""
+    url = settings.WHATSAPP_SERVER_URL  # set in settings
+    with metrics.SIDECAR_SEND_SECONDS.time(endpoint=endpoint, outcome='ok') as labels:
+        try:
+            r = sidecar_session.post(url + endpoint, **kwargs)
+            if r.ok:
+                return True, ""
+            labels['outcome'] = f'http_{r.status_code}'
+            logger.error("%s returned %s: %s", error_message, r.status_code, r.text)
+            return False, r.text
+        except requests.exceptions.RequestException as exc:
+            labels['outcome'] = 'connection_error'
+            logger.exception("Failed sending to %s: %s", error_message, exc)
+            return False, str(exc)
 
 
 def send_whatsapp_otp(phone, code):
     """Send OTP to WhatsApp service. Returns (success, error_message)."""
-    url = settings.WHATSAPP_SERVER_URL  # set in settings
     phone = normalize_whatsapp_phone(phone)
     payload = {"phone": phone, "code": code}
-
-    try:
-        r = requests.post(url + "/send_otp", json=payload, timeout=10)
-        if r.ok:
-            return True, ""
-        logger.error("WhatsApp OTP service returned %s: %s", r.status_code, r.text)
-        return False, r.text
-    except requests.exceptions.RequestException as exc:
-        logger.exception("Failed sending OTP to WhatsApp service: %s", exc)
-        return False, str(exc)
+    return post_to_sidecar("/send_otp", "WhatsApp OTP service", json=payload, timeout=10)
 
 
 def send_whatsapp_message(phone, message, attachment=None):
-    url = settings.WHATSAPP_SERVER_URL  # set in settings
     phone = normalize_whatsapp_phone(phone)
     if attachment:
         # Send as multipart/form-data (supports image or PDF)
         files = {"image": attachment}
         data = {"phone": phone, "message": message}
-        try:
-            r = requests.post(url + "/send_message", data=data, files=files, timeout=15)
-            if r.ok:
-                return True, ""
-            logger.error("WhatsApp message service returned %s: %s", r.status_code, r.text)
-            return False, r.text
-        except requests.exceptions.RequestException as exc:
-            logger.exception("Failed sending message to WhatsApp service: %s", exc)
-            return False, str(exc)
-    else:
-        # Send as JSON
-        payload = {"phone": phone, "message": message}
-        try:
-            r = requests.post(url + "/send_message", json=payload, timeout=15)
-            if r.ok:
-                return True, ""
-            logger.error("WhatsApp message service returned %s: %s", r.status_code, r.text)
-            return False, r.text
-        except requests.exceptions.RequestException as exc:
-            logger.exception("Failed sending message to WhatsApp service: %s", exc)
-            return False, str(exc)
+        return post_to_sidecar("/send_message", "WhatsApp message service", data=data, files=files, timeout=15)
+    # Send as JSON
+    payload = {"phone": phone, "message": message}
+    return post_to_sidecar("/send_message", "WhatsApp message service", json=payload, timeout=15)
@@ -1,3 +1,96 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.models import Guest
+
+from . import engine
+
+
+@override_settings(OTP_ENABLED=True, DEBUG=False)
+class OTPEngineTests(TestCase):
+    PHONE = '+5511988887777'
+
+    def setUp(self):
+        cache.clear()
+        self.guest = Guest.objects.create(name='Ana', phone_number=self.PHONE)
+        patcher = mock.patch('otp.engine.kick_delivery')
+        self.kick = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _login(self, **extra):
+        return self.client.post(reverse('login_phone'), {'country_code': '55', 'phone': '11988887777'}, **extra)
+
+    def test_code_is_hashed_and_single_use(self):
+        code = engine.issue(self.PHONE)
+        self.assertNotIn(code, str(cache.get(f"otp:code:{self.PHONE}")))
+        self.assertEqual(engine.verify(self.PHONE, '00000'), engine.INVALID)
+        self.assertEqual(engine.verify(self.PHONE, code), engine.VALID)
+        self.assertEqual(engine.verify(self.PHONE, code), engine.EXPIRED)
+
+    def test_code_discarded_after_too_many_attempts(self):
+        code = engine.issue(self.PHONE)
+        for _ in range(engine.MAX_VERIFY_ATTEMPTS - 1):
+            self.assertEqual(engine.verify(self.PHONE, '00000'), engine.INVALID)
+        self.assertEqual(engine.verify(self.PHONE, '00000'), engine.EXPIRED)
+        self.assertEqual(engine.verify(self.PHONE, code), engine.EXPIRED)
+
+    def test_login_queues_delivery_and_verifies(self):
+        with mock.patch('otp.engine.send_whatsapp_otp', return_value=(True, '')) as send:
+            response = self._login()
+            self.assertRedirects(response, reverse('verify_otp'), fetch_redirect_response=False)
+            self.kick.assert_called_once()
+            send.assert_not_called()  # só o worker envia
+            engine.send_queued()
+        (phone, code), _ = send.call_args
+        self.assertEqual(phone, self.PHONE)
+
+        response = self.client.post(reverse('verify_otp'), {'code': code})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.guest.refresh_from_db()
+        self.assertEqual(self.guest.active_session_key, self.client.session.session_key)
+
+    def test_admin_pages_need_the_verified_code(self):
+        with mock.patch('core.decorators.ADMIN_PHONES', [self.PHONE]), \
+                mock.patch('otp.engine.send_whatsapp_otp', return_value=(True, '')) as send:
+            self._login()
+            for url in (reverse('wedding_admin'), reverse('export_guests')):
+                response = self.client.get(url, {'_profile': '1'})
+                self.assertRedirects(response, reverse('login_phone'), fetch_redirect_response=False)
+            self.assertNotIn('otp_user_id', self.client.session)
+
+            engine.send_queued()
+            (_, code), _ = send.call_args
+            self.client.post(reverse('verify_otp'), {'code': code})
+            self.assertEqual(self.client.get(reverse('wedding_admin')).status_code, 200)
+
+    def test_login_rate_limited_per_phone_and_ip(self):
+        limit, _ = engine.SEND_LIMIT_PER_PHONE
+        for _ in range(limit):
+            self.assertEqual(self._login().status_code, 302)
+        response = self._login()
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+        limit, _ = engine.SEND_LIMIT_PER_IP
+        for _ in range(limit):
+            engine.hit('login-ip', '10.0.0.1', *engine.SEND_LIMIT_PER_IP)
+        response = self.client.post(
+            reverse('login_phone'), {'country_code': '55', 'phone': '11900001111'}, HTTP_X_REAL_IP='10.0.0.1',
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_sliding_window_counts_previous_window(self):
+        with mock.patch('otp.engine.time.time', return_value=1000 * 60 + 59):
+            for _ in range(4):
+                self.assertTrue(engine.hit('t', 'x', 4, 60)[0])
+            self.assertFalse(engine.hit('t', 'x', 4, 60)[0])
+        # Começo da janela seguinte: a anterior ainda pesa 90% (3.6 + 1 nova)
+        with mock.patch('otp.engine.time.time', return_value=1001 * 60 + 6):
+            self.assertTrue(engine.hit('t', 'x', 4, 60)[0])
+            self.assertFalse(engine.hit('t', 'x', 4, 60)[0])
+        # Com 3/4 da janela passados a anterior quase não conta
+        with mock.patch('otp.engine.time.time', return_value=1001 * 60 + 46):
+            self.assertTrue(engine.hit('t', 'x', 4, 60)[0])
@@ -1,16 +1,32 @@
+import logging
+
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from core.models import Guest, ExtraGuest, SiteContent
 from django.utils import timezone
 from datetime import timedelta
 
+from django.conf import settings
+
+from . import engine
 from .forms import PhoneForm, OTPForm
-from .models import OTP
-from .services import find_user_by_phone, normalize_phone_number, send_whatsapp_otp
+from .services import find_user_by_phone, normalize_phone_number
 
 from core.decorators import ADMIN_PHONES
 from core.settings import DEBUG
 
+logger = logging.getLogger(__name__)
+
+
+def _rate_limited(request, template, context, retry_after):
+    minutes = max(1, round(retry_after / 60))
+    logger.warning("Limite de tentativas de login atingido (%s)", request.path)
+    context["form"].add_error(None, f"Muitas tentativas. Tente novamente em {minutes} min.")
+    response = render(request, template, context, status=429)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
 def login_phone(request):
     if request.method == "POST":
         form = PhoneForm(request.POST)
@@ -19,48 +35,45 @@ def login_phone(request):
             phone_number = form.cleaned_data["phone"]
             full_phone = normalize_phone_number(phone_number, country_code)
 
+            retry_after = engine.check_limits([
+                ("login-phone", full_phone, engine.SEND_LIMIT_PER_PHONE),
+                ("login-ip", engine.client_ip(request), engine.SEND_LIMIT_PER_IP),
+            ])
+            if retry_after:
+                return _rate_limited(request, "otp/login_phone.html", {"form": form, "site_content": SiteContent.load()}, retry_after)
+
             # Try to find Guest by phone, or ExtraGuest by phone
             user, is_extra, matched_phone = find_user_by_phone(phone_number, country_code)
             if not user:
-                print(f"Redirect: phone not in guest list ({full_phone})")
+                logger.info("Login recusado: telefone fora da lista de convidados (%s)", full_phone)
                 form.add_error(None, "Este número de telefone não está na lista de convidados.")
                 return render(request, "otp/login_phone.html", {"form": form, "site_content": SiteContent.load()})
 
+            # Um novo login desfaz o anterior desta sessão
+            request.session.pop("otp_user_id", None)
+            request.session.pop("guest_authenticated", None)
+
             # Mark in session if this is an extra guest login
             request.session["is_extra_guest_login"] = is_extra
             if is_extra:
                 request.session["extra_guest_phone"] = matched_phone or full_phone
             else:
                 request.session.pop("extra_guest_phone", None)
-            request.session["otp_user_id"] = user.id
-
+            # Só vira otp_user_id depois do código verificado (verify_otp)
+            request.session["otp_pending_user_id"] = user.id
 
             if user.active_session_key and user.active_until and user.active_until > timezone.now():
                 # Clear the active session so user can request a new OTP
-                print(f"Clearing active session for {full_phone} (was: {user.active_session_key}, until: {user.active_until})")
+                logger.info("Limpando sessão ativa de %s (até %s)", full_phone, user.active_until)
                 user.active_session_key = None
                 user.active_until = None
                 user.save()
                 # Optionally, you can also log out the previous session if needed
 
-            code = OTP.generate_code()
-            if DEBUG:
-                print(f"DEBUG: OTP para {full_phone} é {code}")
-                # Skip WhatsApp in debug mode - auto-verify
-            # try:
-            #     sent, error = send_whatsapp_otp(full_phone, code)
-            # except Exception as exc:
-            #     print(f"Redirect: erro ao tentar enviar OTP para {full_phone}: {exc}")
-            #     messages.error(request, f"Erro técnico ao tentar enviar OTP: {exc}")
-            #     # If sending fails due to service error, fall back to direct login
-            #     error = str(exc)
-            #     sent = False
-            sent, error = False, "otp removed from page right now"
-            if not sent:
-                print(f"Fallback: não foi possível enviar OTP para {full_phone}: {error} — concedendo acesso direto.")
-                # Informational message for the user/admin
-                messages.warning(request, "Não foi possível enviar o OTP; acesso direto concedido temporariamente.")
-                # Authenticate the guest directly as a fallback (legacy: mark both days confirmed)
+            if not settings.OTP_ENABLED:
+                logger.info("OTP desativado: acesso direto para %s", full_phone)
+                # Authenticate the guest directly (OTP_ENABLED=False)
+                request.session.pop("otp_pending_user_id", None)
                 request.session["otp_user_id"] = user.id
 
                 # Set session expiry and mark guest as authenticated
@@ -77,18 +90,14 @@ def login_phone(request):
 
                 return redirect("home")
 
-            OTP.objects.create(
-                user=user,
-                code=code,
-                expires_at=timezone.now() + timedelta(minutes=5)
-            )
-
-            # Persist single-active-session info on the Guest
-            user.active_session_key = session_key
-            user.active_until = timezone.now() + timedelta(seconds=7200)
-            user.save()
+            # O código vai para o telefone que fez o login (o do convidado extra, se for o caso)
+            otp_phone = matched_phone or full_phone
+            code = engine.issue(otp_phone)
+            if DEBUG:
+                logger.debug("OTP para %s é %s", otp_phone, code)
+            engine.deliver(otp_phone, code)
 
-            request.session["otp_user_id"] = user.id
+            request.session["otp_phone"] = otp_phone
             return redirect("verify_otp")
 
     return render(request, "otp/login_phone.html", {"form": form if 'form' in locals() else PhoneForm(), "site_content": SiteContent.load()})
@@ -98,12 +107,19 @@ def verify_otp(request):
         form = OTPForm(request.POST)
         if form.is_valid():
             code = form.cleaned_data["code"]
-            user_id = request.session.get("otp_user_id")
+            user_id = request.session.get("otp_pending_user_id")
+            otp_phone = request.session.get("otp_phone")
 
-            if not user_id:
+            if not user_id or not otp_phone:
                 messages.error(request, "Session expired")
                 return redirect("login_phone")
 
+            retry_after = engine.check_limits([
+                ("verify-phone", otp_phone, engine.VERIFY_LIMIT_PER_PHONE),
+                ("verify-ip", engine.client_ip(request), engine.VERIFY_LIMIT_PER_IP),
+            ])
+            if retry_after:
+                return _rate_limited(request, "otp/verify_otp.html", {"form": form}, retry_after)
 
             try:
                 user = Guest.objects.get(id=user_id)
@@ -113,39 +129,25 @@ def verify_otp(request):
 
             is_extra = request.session.get("is_extra_guest_login", False)
             extra_guest_phone = request.session.get("extra_guest_phone")
-            
-            # In DEBUG mode, skip OTP validation
-            if DEBUG:
-                otp_valid = True
-            elif is_extra and extra_guest_phone:
-                # Find the extra guest
-                try:
-                    extra = ExtraGuest.objects.get(phone_number=extra_guest_phone, main_guest_id=user_id)
-                except ExtraGuest.DoesNotExist:
+            if is_extra and extra_guest_phone:
+                if not ExtraGuest.objects.filter(phone_number=extra_guest_phone, main_guest_id=user_id).exists():
                     messages.error(request, "Convidado extra não encontrado.")
                     return redirect("login_phone")
-                # OTP is always tied to the main guest, so check OTP for user
-                otp = OTP.objects.filter(user=user, code=code).order_by("-created_at").first()
-                if not otp:
-                    messages.error(request, "Invalid code")
-                    return redirect("verify_otp")
-                if otp.is_expired():
-                    messages.error(request, "Code expired")
-                    return redirect("login_phone")
-                otp_valid = True
-            else:
-                otp = OTP.objects.filter(user=user, code=code).order_by("-created_at").first()
-                if not otp:
-                    messages.error(request, "Invalid code")
-                    return redirect("verify_otp")
-                if otp.is_expired():
-                    messages.error(request, "Code expired")
-                    return redirect("login_phone")
-                otp_valid = True
-            
+
+            # In DEBUG mode, skip OTP validation
+            result = engine.VALID if DEBUG else engine.verify(otp_phone, code)
+            if result == engine.INVALID:
+                messages.error(request, "Invalid code")
+                return redirect("verify_otp")
+            if result == engine.EXPIRED:
+                messages.error(request, "Code expired")
+                return redirect("login_phone")
 
             # Set session expiry and mark guest as authenticated
             # Example: sessions expire in 1 hour (3600 seconds)
+            request.session.pop("otp_phone", None)
+            request.session.pop("otp_pending_user_id", None)
+            request.session["otp_user_id"] = user.id
             request.session["guest_authenticated"] = True
             # Set is_admin flag in session if phone is in ADMIN_PHONES
             request.session["is_admin"] = user.phone_number in ADMIN_PHONES
@@ -0,0 +1,94 @@
+// Scripts da página inicial (index.html): modal de mensagem do presente e
+// envio do RSVP via fetch.
+
+document.addEventListener('DOMContentLoaded', () => {
+  const modal = document.getElementById('gift-message-modal');
+  const textarea = document.getElementById('gift-msg-input');
+  const charCount = document.getElementById('gift-char-count');
+  let pendingUrl = '';
+
+  function openModal(url) {
+    pendingUrl = url;
+    textarea.value = '';
+    charCount.textContent = '0';
+    modal.style.display = 'flex';
+    setTimeout(() => textarea.focus(), 50);
+  }
+
+  function closeModal() {
+    modal.style.display = 'none';
+    pendingUrl = '';
+  }
+
+  function goToUrl(withMessage) {
+    if (!pendingUrl) return;
+    const msg = withMessage ? textarea.value.trim() : '';
+    const target = pendingUrl + (pendingUrl.includes('?') ? '&' : '?') + 'message=' + encodeURIComponent(msg);
+    window.location.href = target;
+  }
+
+  document.querySelectorAll('.btn-gift').forEach(btn => {
+    btn.addEventListener('click', e => {
+      e.preventDefault();
+      openModal(btn.getAttribute('href'));
+    });
+  });
+
+  document.getElementById('gift-modal-cancel').addEventListener('click', closeModal);
+  document.getElementById('gift-modal-confirm').addEventListener('click', () => goToUrl(true));
+  document.getElementById('gift-modal-skip').addEventListener('click', () => goToUrl(false));
+
+  modal.addEventListener('click', e => {
+    if (e.target === modal) closeModal();
+  });
+
+  document.addEventListener('keydown', e => {
+    if (e.key === 'Escape' && modal.style.display === 'flex') closeModal();
+  });
+});
+
+// Submit RSVP actions via fetch so only the RSVP section is re-rendered.
+// This avoids a full-page reload, which was scrolling the user to the top
+// and then back down to the RSVP section on every button click.
+(function () {
+  function rsvpSection() {
+    return document.getElementById('rsvp');
+  }
+
+  document.addEventListener('submit', async function (e) {
+    const form = e.target;
+    if (!form.matches('#rsvp form')) return;
+    e.preventDefault();
+
+    const submitter = e.submitter;
+    const formData = new FormData(form);
+    // FormData does not include the clicked submit button on its own.
+    if (submitter && submitter.name) {
+      formData.append(submitter.name, submitter.value);
+    }
+
+    const section = rsvpSection();
+    if (section) section.setAttribute('aria-busy', 'true');
+
+    try {
+      const resp = await fetch(form.getAttribute('action') || window.location.href, {
+        method: 'POST',
+        headers: { 'X-Requested-With': 'XMLHttpRequest' },
+        body: formData,
+      });
+      if (!resp.ok) throw new Error('RSVP request failed: ' + resp.status);
+
+      const html = await resp.text();
+      const doc = new DOMParser().parseFromString(html, 'text/html');
+      const fresh = doc.getElementById('rsvp');
+      const current = rsvpSection();
+      if (fresh && current) {
+        current.replaceWith(fresh);
+      }
+    } catch (err) {
+      console.error(err);
+      // Fall back to a normal submit if the fetch path fails.
+      form.submit();
+    }
+  });
+})();
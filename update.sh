@@ -84,8 +84,13 @@ else
 fi
 
 # 5. Django Collect Static
+# Gera os nomes com hash (staticfiles.json) e as cópias .gz (core/storage.py)
 log_message "\n${YELLOW}[5/6] Coletando arquivos estáticos...${NC}"
 if python manage.py collectstatic --noinput 2>&1 | tee -a "$LOG_FILE"; then
+    if [ ! -f "$PROJECT_DIR/staticfiles/staticfiles.json" ]; then
+        log_message "${RED}✗ Manifesto staticfiles.json não foi gerado${NC}"
+        exit 1
+    fi
     log_message "${GREEN}✓ Arquivos estáticos coletados${NC}"
 else
     log_message "${RED}✗ Erro ao coletar estáticos${NC}"